@@ -0,0 +1,166 @@
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench.standin_db import StandInConnection
+from bench.synthetic import FORMATS, make_document
+
+# ⏱️ End-to-end benchmark: per-stage latency percentiles, throughput and peak Python memory
+#   python bench/run.py --formats pdf_text,docx --pages 1,10 --lines 20,500 --iterations 20
+#   python bench/run.py --save bench/baseline.json
+#   python bench/run.py --baseline bench/baseline.json --threshold 0.2
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    k = (len(ordered) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def measure(fn, iterations, warmup=1):
+    for _ in range(warmup):
+        fn()
+    durations = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - started)
+
+    # separate run for memory, tracemalloc slows the timed loop down; tracemalloc only sees this
+    # process, so the PDF text / OCR sub-tasks run inline instead of in the CPU pool workers
+    from pipeline.executors import cpu_inline
+
+    with cpu_inline():
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        "iterations": iterations,
+        "mean_ms": statistics.mean(durations) * 1000,
+        "p50_ms": percentile(durations, 0.50) * 1000,
+        "p95_ms": percentile(durations, 0.95) * 1000,
+        "p99_ms": percentile(durations, 0.99) * 1000,
+        "throughput_per_s": len(durations) / sum(durations) if sum(durations) else float("inf"),
+        "peak_mb": peak / (1024 * 1024),
+    }
+
+
+def llm_reply(products):
+    # what a chatty model reply looks like: prose around the JSON object
+    payload = {"invoice_number": "123456", "invoice_date": "2024-03-12", "total_ttc": "1 234,56", "products": products}
+    return "Voici les données extraites :\n" + json.dumps(payload, ensure_ascii=False) + "\nN'hésitez pas si besoin."
+
+
+def stages_for(filename, content, products):
+    from db.fournisseur import get_or_create_fournisseur, invalidate_fournisseur_cache
+    from db.produit import insert_produits
+    from extractor.ai_extractor import clean_products, extract_first_json
+    from extractor.extractor_router import extract_entities_timed
+    from parser.file_router import parse_file
+
+    text = parse_file(filename, content)
+    reply = llm_reply(products)
+
+    def db_insert():
+        invalidate_fournisseur_cache()
+        conn = StandInConnection()
+        fournisseur_id = get_or_create_fournisseur({"nom": "ATLAS DISTRIBUTION", "ice": "001526789000045"}, conn=conn)
+        insert_produits(fournisseur_id, products, conn=conn)
+
+    return {
+        "parse_file": lambda: parse_file(filename, content),
+        "extract_entities": lambda: extract_entities_timed(text),
+        "clean_products": lambda: clean_products(products),
+        "extract_first_json": lambda: extract_first_json(reply),
+        "db_insert": db_insert,
+    }
+
+
+def run(formats, pages_list, lines_list, iterations, stages):
+    results = {}
+    for fmt in formats:
+        for pages in pages_list:
+            # single-page formats ignore the page count
+            if pages > 1 and not fmt.startswith("pdf"):
+                continue
+            for line_items in lines_list:
+                filename, content, products = make_document(fmt, pages, line_items)
+                for stage, fn in stages_for(filename, content, products).items():
+                    if stages and stage not in stages:
+                        continue
+                    key = f"{stage}|{fmt}|{pages}p|{line_items}l"
+                    results[key] = measure(fn, iterations)
+                    r = results[key]
+                    print(
+                        f"{key:<48} p50 {r['p50_ms']:9.2f} ms  p95 {r['p95_ms']:9.2f} ms  p99 {r['p99_ms']:9.2f} ms"
+                        f"  {r['throughput_per_s']:9.1f}/s  peak {r['peak_mb']:7.2f} MB"
+                    )
+    return results
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        ratio = current["p50_ms"] / previous["p50_ms"] if previous["p50_ms"] else 1.0
+        if ratio > 1 + threshold:
+            regressions.append((key, previous["p50_ms"], current["p50_ms"], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the invoice extraction pipeline stages.")
+    parser.add_argument("--formats", default=",".join(FORMATS), help=f"comma-separated, among {', '.join(FORMATS)}")
+    parser.add_argument("--pages", default="1,5", help="page counts for PDF documents")
+    parser.add_argument("--lines", default="10,200", help="line-item counts")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--stages", default="", help="restrict to these stages (comma-separated)")
+    parser.add_argument("--save", help="write results as JSON (e.g. a new baseline)")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p50 slowdown before flagging (0.2 = +20%%)")
+    args = parser.parse_args(argv)
+
+    try:
+        results = run(
+            [f for f in args.formats.split(",") if f],
+            [int(p) for p in args.pages.split(",")],
+            [int(n) for n in args.lines.split(",")],
+            args.iterations,
+            {s for s in args.stages.split(",") if s},
+        )
+    finally:
+        from pipeline.executors import shutdown_pools
+        shutdown_pools()
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results saved to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for key, before, after, ratio in regressions:
+            print(f"❌ Regression {key}: p50 {before:.2f} ms -> {after:.2f} ms (x{ratio:.2f})")
+        if regressions:
+            return 1
+        print("✅ No regression against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+import itertools
+
+# 🧱 Local stand-in for a pyodbc connection: accepts the statements, hands out identity values.
+# It measures the Python side of the db helpers (row building, batching) without SQL Server.
+
+
+class StandInCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.fast_executemany = False
+        self._row = None
+
+    def execute(self, sql, params=()):
+        self.connection.statements += 1
+        self._row = (next(self.connection.ids),) if "OUTPUT INSERTED" in sql else None
+        return self
+
+    def executemany(self, sql, rows):
+        self.connection.statements += 1
+        self.connection.rows += len(rows)
+
+    def fetchone(self):
+        return self._row
+
+    def fetchall(self):
+        return []
+
+
+class StandInConnection:
+    def __init__(self):
+        self.ids = itertools.count(1)
+        self.statements = 0
+        self.rows = 0
+
+    def cursor(self):
+        return StandInCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
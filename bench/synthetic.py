@@ -0,0 +1,149 @@
+import io
+import random
+
+# 🧪 Synthetic invoices for the benchmark harness (text PDF, scanned PDF, PNG/TIFF, DOCX, XLSX)
+
+HEADER = [
+    "SOCIETE ATLAS DISTRIBUTION SARL au capital de 1 000 000 DH",
+    "Siège Social: 24 Bd Zerktouni Casablanca",
+    "ICE: 001526789000045",
+    "IF: 40211234",
+    "CNSS: 8812345",
+    "Facture N° {number}",
+    "Date: 12-03-24",
+    "Client: ENTREPRISE CLIENTE SA",
+    "Désignation Qté P.U Total",
+]
+
+
+def invoice_lines(line_items, seed=0):
+    rng = random.Random(seed)
+    number = rng.randint(100000, 999999)
+    lines = [line.format(number=number) for line in HEADER]
+    total_ht = 0.0
+    products = []
+    for i in range(line_items):
+        qty = rng.randint(1, 50)
+        unit = round(rng.uniform(5, 5000), 2)
+        total = round(qty * unit, 2)
+        total_ht += total
+        products.append({"designation": f"Article REF-{i:04d}", "quantity": qty, "unit_price": unit, "total_price": total})
+        lines.append(f"Article REF-{i:04d} {qty} {unit:.2f} {total:.2f}".replace(".", ","))
+    tva = round(total_ht * 0.2, 2)
+    lines += [
+        f"MONTANT HT: {total_ht:.2f}".replace(".", ","),
+        f"TVA 20% {tva:.2f}".replace(".", ","),
+        f"MONTANT TTC {total_ht + tva:.2f} MAD".replace(".", ","),
+        "Paiements à exécuter au profit de : ATLAS DISTRIBUTION",
+    ]
+    return lines, products
+
+
+def split_pages(lines, pages):
+    per_page = max(1, -(-len(lines) // pages))
+    chunks = [lines[i:i + per_page] for i in range(0, len(lines), per_page)]
+    return chunks + [[] for _ in range(pages - len(chunks))]
+
+
+def _pdf_string(text):
+    data = text.encode("latin-1", "replace")
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def text_pdf(lines, pages=1):
+    # minimal PDF writer: one Helvetica text stream per page, no external dependency
+    page_chunks = split_pages(lines, pages)
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"]
+    kids = []
+    for chunk in page_chunks:
+        # shrink the font on long pages so every line stays inside the MediaBox
+        leading = min(11.0, 760.0 / max(1, len(chunk)))
+        stream = b"BT /F1 %.2f Tf %.2f TL 40 800 Td " % (leading * 0.8, leading) + b"".join(_pdf_string(line) + b" Tj T* " for line in chunk) + b"ET"
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % k for k in kids) + b"] /Count %d >>" % len(kids)
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % i + obj + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def _render_pages(lines, pages, dpi=150):
+    from PIL import Image, ImageDraw, ImageFont
+
+    font = ImageFont.load_default()
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    images = []
+    for chunk in split_pages(lines, pages):
+        image = Image.new("L", (width, height), 255)
+        draw = ImageDraw.Draw(image)
+        for i, line in enumerate(chunk):
+            draw.text((60, 60 + i * 18), line, fill=0, font=font)
+        images.append(image)
+    return images
+
+
+def scanned_pdf(lines, pages=1):
+    images = _render_pages(lines, pages)
+    out = io.BytesIO()
+    images[0].save(out, "PDF", save_all=True, append_images=images[1:], resolution=150)
+    return out.getvalue()
+
+
+def image(lines, fmt="PNG"):
+    out = io.BytesIO()
+    _render_pages(lines, 1)[0].save(out, fmt)
+    return out.getvalue()
+
+
+def docx(lines):
+    from docx import Document
+
+    document = Document()
+    for line in lines:
+        document.add_paragraph(line)
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
+
+
+def xlsx(lines):
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    sheet = workbook.active
+    for line in lines:
+        sheet.append(line.split(" "))
+    out = io.BytesIO()
+    workbook.save(out)
+    return out.getvalue()
+
+
+# format -> (filename extension, builder(lines, pages))
+FORMATS = {
+    "pdf_text": (".pdf", lambda lines, pages: text_pdf(lines, pages)),
+    "pdf_scanned": (".pdf", lambda lines, pages: scanned_pdf(lines, pages)),
+    "png": (".png", lambda lines, pages: image(lines, "PNG")),
+    "tiff": (".tiff", lambda lines, pages: image(lines, "TIFF")),
+    "docx": (".docx", lambda lines, pages: docx(lines)),
+    "xlsx": (".xlsx", lambda lines, pages: xlsx(lines)),
+}
+
+
+def make_document(fmt, pages=1, line_items=20, seed=0):
+    extension, build = FORMATS[fmt]
+    lines, products = invoice_lines(line_items, seed)
+    return f"invoice_{fmt}_{pages}p_{line_items}l{extension}", build(lines, pages), products
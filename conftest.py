@@ -0,0 +1 @@
+# 🧪 Keeps the repository root importable (db, extractor, parser...) for tests under tests/
@@ -1,10 +1,237 @@
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+
 import pyodbc
 
+from observability.metrics import DB_STATEMENT_SECONDS
+
+CONNECTION_STRING = os.getenv(
+    "DB_CONNECTION_STRING",
+    "DRIVER={ODBC Driver 17 for SQL Server};"
+    "SERVER=SALMA\\SQLEXPRESS;"
+    "DATABASE=FactureDB;"
+    "Trusted_Connection=yes;"
+)
+
+# 🏊 Pool settings
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 2))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 20))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE_SECONDS = float(os.getenv("DB_POOL_RECYCLE_SECONDS", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# the pool below replaces the ODBC driver manager pooling
+pyodbc.pooling = False
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+@lru_cache(maxsize=256)
+def statement_label(sql):
+    # low-cardinality label: verb + target table, e.g. "INSERT Produit"
+    words = sql.split(None, 1)
+    verb = words[0].upper() if words else ""
+    table = re.search(r"\b(?:INTO|FROM|UPDATE|TABLE)\s+\[?(\w+)", sql, re.IGNORECASE)
+    return f"{verb} {table.group(1)}" if table else verb
+
+
+class TimedCursor:
+    # times execute/executemany, everything else goes straight to the pyodbc cursor
+    def __init__(self, raw):
+        object.__setattr__(self, "_raw", raw)
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __setattr__(self, name, value):
+        # e.g. cursor.fast_executemany = True must reach the driver
+        setattr(self._raw, name, value)
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def _timed(self, method, sql, *args):
+        started = time.perf_counter()
+        try:
+            result = method(sql, *args)
+        finally:
+            DB_STATEMENT_SECONDS.observe(time.perf_counter() - started, statement=statement_label(sql))
+        return self if result is self._raw else result
+
+    def execute(self, sql, *params):
+        return self._timed(self._raw.execute, sql, *params)
+
+    def executemany(self, sql, rows):
+        return self._timed(self._raw.executemany, sql, rows)
+
+
+class PooledConnection:
+    # behaves like a pyodbc connection, close() hands it back to the pool instead
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise pyodbc.ProgrammingError("Attempt to use a closed connection.")
+        return getattr(self._raw, name)
+
+    def cursor(self):
+        return TimedCursor(self.__getattr__("cursor")())
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool._release(raw, self._created_at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._raw is not None:
+            if exc_type is None:
+                self._raw.commit()
+            else:
+                self._raw.rollback()
+        self.close()
+
+    def __del__(self):
+        # helper raised before close(): the state of the transaction is unknown, drop it
+        if getattr(self, "_raw", None) is not None:
+            raw, self._raw = self._raw, None
+            self._pool._discard(raw)
+
+
+class ConnectionPool:
+    def __init__(self, connection_string, min_size, max_size, timeout, recycle, pre_ping):
+        self.connection_string = connection_string
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self._idle = []  # (raw, created_at), most recently used last
+        self._size = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            "checkouts": 0, "created": 0, "recycled": 0, "ping_failures": 0,
+            "discarded": 0, "timeouts": 0, "wait_seconds": 0.0,
+        }
+
+    def _connect(self):
+        raw = pyodbc.connect(self.connection_string)
+        with self._cond:
+            self._stats["created"] += 1
+        return raw, time.monotonic()
+
+    def _close_quietly(self, raw):
+        try:
+            raw.close()
+        except pyodbc.Error:
+            pass
+
+    def _ping(self, raw):
+        try:
+            raw.cursor().execute("SELECT 1").fetchone()
+            return True
+        except pyodbc.Error:
+            return False
+
+    def acquire(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        while True:
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(f"No database connection available after {self.timeout}s")
+                    self._cond.wait(remaining)
+
+                if self._idle:
+                    raw, created_at = self._idle.pop()
+                else:
+                    self._size += 1
+                    raw = None
+
+            if raw is None:
+                try:
+                    raw, created_at = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif time.monotonic() - created_at > self.recycle:
+                self._discard(raw, stat="recycled")
+                continue
+            elif self.pre_ping and not self._ping(raw):
+                self._discard(raw, stat="ping_failures")
+                continue
+
+            with self._cond:
+                self._stats["checkouts"] += 1
+                self._stats["wait_seconds"] += time.monotonic() - started
+            return PooledConnection(self, raw, created_at)
+
+    def _release(self, raw, created_at):
+        try:
+            # never hand out a connection with a half-finished transaction
+            raw.rollback()
+        except pyodbc.Error:
+            self._discard(raw)
+            return
+        with self._cond:
+            self._idle.append((raw, created_at))
+            self._cond.notify()
+
+    def _discard(self, raw, stat="discarded"):
+        self._close_quietly(raw)
+        with self._cond:
+            self._size -= 1
+            self._stats[stat] += 1
+            self._cond.notify()
+
+    def warm(self):
+        conns = [self.acquire() for _ in range(min(self.min_size, self.max_size))]
+        for conn in conns:
+            conn.close()
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for raw, _ in idle:
+            self._close_quietly(raw)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                **self._stats,
+            }
+
+
+pool = ConnectionPool(
+    CONNECTION_STRING, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE,
+    DB_POOL_TIMEOUT, DB_POOL_RECYCLE_SECONDS, DB_POOL_PRE_PING
+)
+
+
 def get_connection():
-    conn = pyodbc.connect(
-        "DRIVER={ODBC Driver 17 for SQL Server};"
-        "SERVER=SALMA\SQLEXPRESS;"
-        "DATABASE=FactureDB;"
-        "Trusted_Connection=yes;"
-    )
-    return conn
+    return pool.acquire()
+
+
+def pool_stats():
+    return pool.stats()
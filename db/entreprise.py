@@ -1,6 +1,23 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
 import pyodbc
 from .database import get_connection
 
+# 🗂️ In-process, write-through cache of Entreprise records (the table is small and read on every /extract).
+# The TTL bounds staleness across worker processes, writes through this module update it immediately.
+ENTREPRISE_CACHE_TTL_SECONDS = float(os.getenv("ENTREPRISE_CACHE_TTL_SECONDS", 300))
+
+COLUMNS = ["id", "nom", "type", "ice", "if", "cnss", "adresse", "tel", "email", "siteweb", "langue_ocr"]
+_SELECT = "SELECT id, nom, type, ice, [if], cnss, adresse, tel, email, siteweb, langue_ocr FROM Entreprise"
+
+_cache = {}  # id -> (record, loaded_at)
+_listing = None  # (records ordered by id, etag, loaded_at), set when the whole table was loaded
+_cache_lock = threading.Lock()
+
 def create_entreprise_table():
     conn = get_connection()
     cursor = conn.cursor()
@@ -19,39 +36,122 @@ def create_entreprise_table():
         siteweb NVARCHAR(100)
     )
     """)
+    # Tesseract language set used for this entreprise's scans (NULL = OCR_LANG default)
+    cursor.execute("""
+    IF COL_LENGTH('Entreprise', 'langue_ocr') IS NULL
+        ALTER TABLE Entreprise ADD langue_ocr NVARCHAR(50)
+    """)
     conn.commit()
     conn.close()
 
+def _row_to_dict(row):
+    return dict(zip(COLUMNS, row))
+
+
+def _fresh(loaded_at):
+    return time.monotonic() - loaded_at < ENTREPRISE_CACHE_TTL_SECONDS
+
+
+def _etag(records):
+    listing = [{"id": r["id"], "nom": r["nom"]} for r in records]
+    return '"' + hashlib.sha256(json.dumps(listing, ensure_ascii=False).encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def _store_all(records):
+    global _listing
+    now = time.monotonic()
+    with _cache_lock:
+        _cache.clear()
+        for record in records:
+            _cache[record["id"]] = (record, now)
+        _listing = (records, _etag(records), now)
+
+
 def insert_entreprise(data):
+    global _listing
     conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("""
-    INSERT INTO Entreprise (nom, type, ice, [if], cnss, adresse, tel, email, siteweb)
-    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    INSERT INTO Entreprise (nom, type, ice, [if], cnss, adresse, tel, email, siteweb, langue_ocr)
+    OUTPUT INSERTED.id
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
     """, (
         data["nom"], data["type"], data["ice"], data["if"], data["cnss"],
-        data["adresse"], data["tel"], data["email"], data["siteweb"]
+        data["adresse"], data["tel"], data["email"], data["siteweb"], data.get("langue_ocr")
     ))
+    new_id = cursor.fetchone()[0]
     conn.commit()
     conn.close()
 
-def get_all_entreprises():
+    # write-through: the new record and the listing (with a new ETag) are visible right away
+    record = {column: data.get(column) for column in COLUMNS}
+    record["id"] = new_id
+    now = time.monotonic()
+    with _cache_lock:
+        _cache[new_id] = (record, now)
+        if _listing is not None:
+            records = _listing[0] + [record]
+            _listing = (records, _etag(records), _listing[2])
+    return new_id
+
+
+def invalidate_entreprise_cache(ent_id=None):
+    global _listing
+    with _cache_lock:
+        if ent_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(ent_id, None)
+        _listing = None
+
+
+def warm_entreprise_cache():
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT id, nom FROM Entreprise")
+    cursor.execute(_SELECT + " ORDER BY id")
     rows = cursor.fetchall()
     conn.close()
-    return [{"id": row[0], "nom": row[1]} for row in rows]
+    records = [_row_to_dict(row) for row in rows]
+    _store_all(records)
+    return records
+
+
+def _listing_snapshot():
+    with _cache_lock:
+        listing = _listing
+    if listing is None or not _fresh(listing[2]):
+        warm_entreprise_cache()
+        with _cache_lock:
+            listing = _listing
+    return listing
+
+
+def get_all_entreprises():
+    records, _, _ = _listing_snapshot()
+    return [{"id": r["id"], "nom": r["nom"]} for r in records]
+
+
+# (listing, etag) for conditional GET /entreprises
+def get_entreprises_listing():
+    records, etag, _ = _listing_snapshot()
+    return [{"id": r["id"], "nom": r["nom"]} for r in records], etag
+
 
 def get_entreprise_by_id(ent_id):
+    with _cache_lock:
+        cached = _cache.get(ent_id)
+    if cached and _fresh(cached[1]):
+        # callers get their own copy, the cached record stays untouched
+        return dict(cached[0])
+
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM Entreprise WHERE id = ?", (ent_id,))
+    cursor.execute(_SELECT + " WHERE id = ?", (ent_id,))
     row = cursor.fetchone()
     conn.close()
-    if row:
-        return {
-            "id": row[0], "nom": row[1], "type": row[2], "ice": row[3], "if": row[4],
-            "cnss": row[5], "adresse": row[6], "tel": row[7], "email": row[8], "siteweb": row[9]
-        }
-    return None
+    if not row:
+        return None
+    record = _row_to_dict(row)
+    with _cache_lock:
+        _cache[ent_id] = (record, time.monotonic())
+    return dict(record)
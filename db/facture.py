@@ -0,0 +1,229 @@
+import os
+import re
+
+from .database import get_connection
+from .fournisseur import find_fournisseur_id
+
+# 📄 Read API: keyset pages (newest id first), capped so a report cannot pull the whole table at once
+FACTURES_PAGE_SIZE = int(os.getenv("FACTURES_PAGE_SIZE", 50))
+FACTURES_MAX_PAGE_SIZE = int(os.getenv("FACTURES_MAX_PAGE_SIZE", 500))
+
+FACTURE_COLUMNS = ["id", "numero", "date", "fournisseur_id", "fournisseur_nom", "fournisseur_ice", "total_ht", "tva", "total_ttc"]
+_SELECT_FACTURE = (
+    "f.id, f.numero, f.date, f.fournisseur_id, fo.nom, fo.ice, f.total_ht, f.tva, f.total_ttc "
+    "FROM Factures f LEFT JOIN Fournisseur fo ON fo.id = f.fournisseur_id"
+)
+
+
+def normalize_numero(value):
+    # "FA 2024/001", "fa-2024-001" -> "FA2024001"
+    text = re.sub(r"[^0-9A-Za-z]+", "", str(value or "")).upper()
+    return text or None
+
+
+def _delete_duplicates(cursor):
+    # re-submitted invoices inserted before the unique index existed: keep the oldest copy
+    cursor.execute("""
+    IF EXISTS (SELECT 1 FROM Factures WHERE numero_norm IS NOT NULL AND fournisseur_id IS NOT NULL AND date IS NOT NULL
+               GROUP BY fournisseur_id, numero_norm, date HAVING COUNT(*) > 1)
+    BEGIN
+        SELECT id, MIN(id) OVER (PARTITION BY fournisseur_id, numero_norm, date) AS keep_id
+        INTO #facture_dupes
+        FROM Factures
+        WHERE numero_norm IS NOT NULL AND fournisseur_id IS NOT NULL AND date IS NOT NULL;
+
+        IF OBJECT_ID('Produit', 'U') IS NOT NULL
+            DELETE p FROM Produit p JOIN #facture_dupes d ON p.factures_id = d.id WHERE d.id <> d.keep_id;
+
+        DELETE f FROM Factures f JOIN #facture_dupes d ON f.id = d.id WHERE d.id <> d.keep_id;
+        DROP TABLE #facture_dupes;
+    END
+    """)
+
+
+def create_facture_table():
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+    IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='Factures' AND xtype='U')
+    CREATE TABLE Factures (
+        id INT PRIMARY KEY IDENTITY,
+        numero NVARCHAR(100),
+        date DATE,
+        fournisseur_id INT FOREIGN KEY REFERENCES Fournisseur(id),
+        total_ht FLOAT,
+        tva FLOAT,
+        total_ttc FLOAT
+    )
+    """)
+    cursor.execute("""
+    IF COL_LENGTH('Factures', 'numero_norm') IS NULL
+        ALTER TABLE Factures ADD numero_norm NVARCHAR(100)
+    """)
+    cursor.execute("SELECT id, numero FROM Factures WHERE numero_norm IS NULL AND numero IS NOT NULL")
+    rows = cursor.fetchall()
+    if rows:
+        cursor.executemany("UPDATE Factures SET numero_norm = ? WHERE id = ?", [(normalize_numero(r[1]), r[0]) for r in rows])
+    _delete_duplicates(cursor)
+    cursor.execute("""
+    IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='UX_Factures_fournisseur_numero_date')
+        CREATE UNIQUE INDEX UX_Factures_fournisseur_numero_date ON Factures (fournisseur_id, numero_norm, date)
+        WHERE fournisseur_id IS NOT NULL AND numero_norm IS NOT NULL AND date IS NOT NULL
+    """)
+    # read path: date-range pages / per-month totals, and per-supplier filters / totals, without scans
+    cursor.execute("""
+    IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='IX_Factures_date')
+        CREATE INDEX IX_Factures_date ON Factures (date) INCLUDE (fournisseur_id, total_ht, tva, total_ttc)
+    """)
+    cursor.execute("""
+    IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='IX_Factures_fournisseur_id')
+        CREATE INDEX IX_Factures_fournisseur_id ON Factures (fournisseur_id, date) INCLUDE (total_ht, tva, total_ttc)
+    """)
+    conn.commit()
+    conn.close()
+
+
+# the full unique key or nothing: numbering restarts every year, (supplier, numero) alone is not an invoice
+def find_facture_id(fournisseur_id, numero, date, conn=None):
+    numero = normalize_numero(numero)
+    if fournisseur_id is None or numero is None or date is None:
+        return None
+    close_conn = conn is None
+    if close_conn:
+        conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        # seek on UX_Factures_fournisseur_numero_date
+        cursor.execute(
+            "SELECT TOP 1 id FROM Factures WHERE fournisseur_id = ? AND numero_norm = ? AND date = ? ORDER BY id",
+            (fournisseur_id, numero, date)
+        )
+        row = cursor.fetchone()
+        return row[0] if row else None
+    finally:
+        if close_conn:
+            conn.close()
+
+
+# 🔎 Re-submitted invoice? supplier by ICE (lookup cache first), then one indexed seek on Factures
+def find_duplicate_facture(ice, numero, date):
+    if not ice or not numero or date is None:
+        return None
+    conn = get_connection()
+    try:
+        fournisseur_id = find_fournisseur_id({"ice": ice}, conn=conn)
+        if fournisseur_id is None:
+            return None
+        return find_facture_id(fournisseur_id, numero, date, conn=conn)
+    finally:
+        conn.close()
+
+
+def _facture_filters(date_from=None, date_to=None, fournisseur_id=None, ice=None, min_total=None, max_total=None):
+    where, params = [], []
+    if date_from is not None:
+        where.append("f.date >= ?")
+        params.append(date_from)
+    if date_to is not None:
+        where.append("f.date <= ?")
+        params.append(date_to)
+    if ice:
+        # resolved through the fournisseur lookup cache, the query then filters on the indexed id
+        found = find_fournisseur_id({"ice": ice})
+        if found is None or (fournisseur_id is not None and found != fournisseur_id):
+            return None
+        fournisseur_id = found
+    if fournisseur_id is not None:
+        where.append("f.fournisseur_id = ?")
+        params.append(fournisseur_id)
+    if min_total is not None:
+        where.append("f.total_ttc >= ?")
+        params.append(min_total)
+    if max_total is not None:
+        where.append("f.total_ttc <= ?")
+        params.append(max_total)
+    return where, params
+
+
+def _where(clauses):
+    return (" WHERE " + " AND ".join(clauses)) if clauses else ""
+
+
+# 📄 Keyset page: ids below the cursor, newest first. -> {"items": [...], "next_cursor": id or None}
+def list_factures(cursor_id=None, limit=None, **filters):
+    limit = max(1, min(limit or FACTURES_PAGE_SIZE, FACTURES_MAX_PAGE_SIZE))
+    built = _facture_filters(**filters)
+    if built is None:
+        return {"items": [], "next_cursor": None}
+    where, params = built
+    if cursor_id is not None:
+        where.append("f.id < ?")
+        params.append(cursor_id)
+
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        # one extra row tells whether there is a next page, no COUNT(*) over the filter
+        cursor.execute(f"SELECT TOP (?) {_SELECT_FACTURE}{_where(where)} ORDER BY f.id DESC", [limit + 1] + params)
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    items = [dict(zip(FACTURE_COLUMNS, row)) for row in rows[:limit]]
+    next_cursor = items[-1]["id"] if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def get_facture(facture_id):
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {_SELECT_FACTURE} WHERE f.id = ?", (facture_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        facture = dict(zip(FACTURE_COLUMNS, row))
+        # seek on IX_Produit_factures_id
+        cursor.execute(
+            "SELECT id, nom, quantite, prix_unitaire, total FROM Produit WHERE factures_id = ? ORDER BY id",
+            (facture_id,)
+        )
+        facture["products"] = [
+            {"id": r[0], "nom": r[1], "quantite": r[2], "prix_unitaire": r[3], "total": r[4]}
+            for r in cursor.fetchall()
+        ]
+        return facture
+    finally:
+        conn.close()
+
+
+def _totals(group_columns, order_by, columns, filters, join=""):
+    built = _facture_filters(**filters)
+    if built is None:
+        return []
+    where, params = built
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT {group_columns}, COUNT(*), SUM(f.total_ht), SUM(f.tva), SUM(f.total_ttc) "
+            f"FROM Factures f{join}{_where(where)} GROUP BY {group_columns} ORDER BY {order_by}",
+            params
+        )
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+    return [dict(zip(columns + ["factures", "total_ht", "tva", "total_ttc"], row)) for row in rows]
+
+
+# 📊 Aggregates are computed by SQL Server; only one row per group comes back
+def totals_by_fournisseur(**filters):
+    return _totals(
+        "f.fournisseur_id, fo.nom, fo.ice", "SUM(f.total_ttc) DESC",
+        ["fournisseur_id", "fournisseur_nom", "fournisseur_ice"], filters,
+        join=" LEFT JOIN Fournisseur fo ON fo.id = f.fournisseur_id"
+    )
+
+
+def totals_by_month(**filters):
+    return _totals("YEAR(f.date), MONTH(f.date)", "YEAR(f.date), MONTH(f.date)", ["year", "month"], filters)
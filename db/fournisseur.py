@@ -1,6 +1,76 @@
+import logging
+import re
+import threading
+import unicodedata
+
 import pyodbc
+from observability.tracing import log
 from .database import get_connection
 
+LEGAL_FORMS = {"SARL", "SARLAU", "SA", "SAS", "STE", "SOCIETE", "AU", "CAPITAL"}
+
+# 🗂️ In-process lookup cache: (key type, normalised value) -> (Fournisseur.id, ice, if)
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def normalize_identifier(value):
+    digits = re.sub(r"\D", "", str(value or ""))
+    return digits or None
+
+
+def normalize_name(value):
+    text = unicodedata.normalize("NFKD", str(value or "")).encode("ascii", "ignore").decode()
+    words = re.sub(r"[^A-Z0-9]+", " ", text.upper()).split()
+    words = [w for w in words if w not in LEGAL_FORMS]
+    return " ".join(words) or None
+
+
+def _lookup_keys(data):
+    keys = []
+    ice = normalize_identifier(data.get('ice'))
+    if ice:
+        keys.append(("ice", ice))
+    if_ = normalize_identifier(data.get('if'))
+    if if_:
+        keys.append(("if", if_))
+    nom = normalize_name(data.get('nom'))
+    if nom:
+        keys.append(("nom_norm", nom))
+    return keys
+
+
+def _backfill_normalized(cursor):
+    cursor.execute("SELECT id, nom, ice, [if] FROM Fournisseur WHERE nom_norm IS NULL")
+    rows = cursor.fetchall()
+    if rows:
+        cursor.executemany(
+            "UPDATE Fournisseur SET nom_norm = ?, ice = ?, [if] = ? WHERE id = ?",
+            [(normalize_name(r[1]), normalize_identifier(r[2]), normalize_identifier(r[3]), r[0]) for r in rows]
+        )
+
+
+def _merge_duplicates(cursor, column):
+    # keep the oldest row per identifier and repoint its factures before the unique index is built
+    cursor.execute(f"""
+    IF EXISTS (SELECT {column} FROM Fournisseur WHERE {column} IS NOT NULL AND {column} <> ''
+               GROUP BY {column} HAVING COUNT(*) > 1)
+    BEGIN
+        SELECT id, MIN(id) OVER (PARTITION BY {column}) AS keep_id
+        INTO #fournisseur_dupes
+        FROM Fournisseur WHERE {column} IS NOT NULL AND {column} <> '';
+
+        IF OBJECT_ID('Factures', 'U') IS NOT NULL
+            UPDATE fa SET fournisseur_id = d.keep_id
+            FROM Factures fa JOIN #fournisseur_dupes d ON fa.fournisseur_id = d.id
+            WHERE d.id <> d.keep_id;
+
+        DELETE f FROM Fournisseur f JOIN #fournisseur_dupes d ON f.id = d.id WHERE d.id <> d.keep_id;
+        DROP TABLE #fournisseur_dupes;
+    END
+    """)
+
+
 def create_fournisseur_table():
     conn = get_connection()
     cursor = conn.cursor()
@@ -18,6 +88,25 @@ def create_fournisseur_table():
         cnss NVARCHAR(100)
     )
     """)
+    cursor.execute("""
+    IF COL_LENGTH('Fournisseur', 'nom_norm') IS NULL
+        ALTER TABLE Fournisseur ADD nom_norm NVARCHAR(255)
+    """)
+    _backfill_normalized(cursor)
+    _merge_duplicates(cursor, "ice")
+    _merge_duplicates(cursor, "[if]")
+    cursor.execute("""
+    IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='UX_Fournisseur_ice')
+        CREATE UNIQUE INDEX UX_Fournisseur_ice ON Fournisseur (ice) WHERE ice IS NOT NULL
+    """)
+    cursor.execute("""
+    IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='UX_Fournisseur_if')
+        CREATE UNIQUE INDEX UX_Fournisseur_if ON Fournisseur ([if]) WHERE [if] IS NOT NULL
+    """)
+    cursor.execute("""
+    IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='IX_Fournisseur_nom_norm')
+        CREATE INDEX IX_Fournisseur_nom_norm ON Fournisseur (nom_norm)
+    """)
     conn.commit()
     conn.close()
 
@@ -31,26 +120,147 @@ def insert_fournisseur(data, conn=None):
     cursor = conn.cursor()
     cursor.execute("""
         INSERT INTO Fournisseur
-        (nom, ice, [if], cnss, adresse, tel, email, siteweb)
+        (nom, ice, [if], cnss, adresse, tel, email, siteweb, nom_norm)
         OUTPUT INSERTED.id
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
     """, (
         data.get('nom'),
-        data.get('ice'),
-        data.get('if'),
+        normalize_identifier(data.get('ice')),
+        normalize_identifier(data.get('if')),
         data.get('cnss') or data.get('fournisseur_cnss'),
         data.get('adresse') or data.get('fournisseur_address'),
         data.get('tel', ""),
         data.get('email', ""),
-        data.get('siteweb', "")
+        data.get('siteweb', ""),
+        normalize_name(data.get('nom'))
     ))
     new_id = cursor.fetchone()[0]
+    invalidate_fournisseur_cache(_lookup_keys(data))
 
     if close_conn:
         conn.commit()
         conn.close()
     return new_id
 
+
+# the ICE decides; IF and name are fallbacks that must not contradict an identifier of the document:
+# "ATLAS SARL" and "Société Atlas SA" share a nom_norm but not an ICE
+_FALLBACK_CHECKS = {"ice": (), "if": ("ice",), "nom_norm": ("ice", "if")}
+
+
+def _sql_column(column):
+    return "[if]" if column == "if" else column
+
+
+def _conflicts(column, identifiers, candidate):
+    return any(
+        identifiers[key] and candidate[key] and identifiers[key] != candidate[key] for key in _FALLBACK_CHECKS[column]
+    )
+
+
+def find_fournisseur_id(data, conn=None):
+    close_conn = False
+    identifiers = {"ice": normalize_identifier(data.get('ice')), "if": normalize_identifier(data.get('if'))}
+    try:
+        for column, value in _lookup_keys(data):
+            with _cache_lock:
+                cached = _cache.get((column, value))
+            if cached and not _conflicts(column, identifiers, {"ice": cached[1], "if": cached[2]}):
+                return cached[0]
+
+            if conn is None:
+                conn = get_connection()
+                close_conn = True
+            cursor = conn.cursor()
+            # oldest row without a conflicting identifier (a cached conflicting row does not hide the others)
+            where, params = [f"{_sql_column(column)} = ?"], [value]
+            for key in _FALLBACK_CHECKS[column]:
+                if identifiers[key]:
+                    where.append(f"({_sql_column(key)} IS NULL OR {_sql_column(key)} = ?)")
+                    params.append(identifiers[key])
+            cursor.execute(f"SELECT TOP 1 id, ice, [if] FROM Fournisseur WHERE {' AND '.join(where)} ORDER BY id", params)
+            row = cursor.fetchone()
+            if row:
+                if not cached:
+                    with _cache_lock:
+                        _cache[(column, value)] = (row[0], row[1], row[2])
+                return row[0]
+        return None
+    finally:
+        if close_conn:
+            conn.close()
+
+
+def _if_holder(if_, conn=None):
+    # -> (id, ice) of the supplier holding this IF, or None
+    close_conn = False
+    if conn is None:
+        conn = get_connection()
+        close_conn = True
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT TOP 1 id, ice FROM Fournisseur WHERE [if] = ?", (if_,))
+        row = cursor.fetchone()
+        return (row[0], row[1]) if row else None
+    finally:
+        if close_conn:
+            conn.close()
+
+
+def _without_conflicting_if(data, conn=None):
+    # UX_Fournisseur_if is unique: an IF already held by a supplier with another ICE (a misread IF, or the
+    # lookup refused the match) is not stored on the new row, the supplier is still created from its ICE
+    if_ = normalize_identifier(data.get('if'))
+    holder = _if_holder(if_, conn) if if_ else None
+    if holder is None:
+        return data
+    log(
+        logging.WARNING, "⚠️ IF déjà attribué à un autre fournisseur", fournisseur_if=if_, holder_id=holder[0],
+        holder_ice=holder[1], fournisseur_ice=normalize_identifier(data.get('ice'))
+    )
+    return {**data, "if": None}
+
+
+# 🔁 Upsert: ICE, then IF, then normalised name; only unknown suppliers get a new row
+def get_or_create_fournisseur(data, conn=None):
+    fournisseur_id = find_fournisseur_id(data, conn=conn)
+    if fournisseur_id is not None:
+        return fournisseur_id
+    try:
+        return insert_fournisseur(_without_conflicting_if(data, conn), conn=conn)
+    except pyodbc.IntegrityError:
+        # another request inserted the same ICE/IF in the meantime
+        fournisseur_id = find_fournisseur_id(data, conn=conn)
+        if fournisseur_id is not None:
+            return fournisseur_id
+        # ... or took this IF for a supplier with another ICE: insert without it
+        return insert_fournisseur(_without_conflicting_if(data, conn), conn=conn)
+
+
+def invalidate_fournisseur_cache(keys=None):
+    with _cache_lock:
+        if keys is None:
+            _cache.clear()
+        else:
+            for key in keys:
+                _cache.pop(key, None)
+
+
+def warm_fournisseur_cache():
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, ice, [if], nom_norm FROM Fournisseur ORDER BY id DESC")
+    rows = cursor.fetchall()
+    conn.close()
+    with _cache_lock:
+        _cache.clear()
+        # descending scan so the oldest row wins, as in find_fournisseur_id
+        for row in rows:
+            for column, value in (("ice", row[1]), ("if", row[2]), ("nom_norm", row[3])):
+                if value:
+                    _cache[(column, value)] = (row[0], row[1], row[2])
+
+
 def get_all_fournisseurs():
     conn = get_connection()
     cursor = conn.cursor()
@@ -1,59 +1,76 @@
 from datetime import datetime
-from db.database import get_connection
-from db.fournisseur import insert_fournisseur
-from db.produit import insert_produits
-
-
-def insert_facture(data):
-    conn = get_connection()
-    cursor = conn.cursor()
 
+import pyodbc
+from db.database import get_connection
+from db.facture import find_facture_id, normalize_numero
+from db.fournisseur import get_or_create_fournisseur, invalidate_fournisseur_cache
+from db.produit import bulk_insert_produits, produit_params
+from extractor.numbers import parse_number
 
 
-    def safe_float(value):
-        if not value:
-            return None
-        try:
-            cleaned = str(value).replace("€", "").replace("$", "").replace(",", ".").replace(" ", "")
-            return float(cleaned)
-        except ValueError:
-            return None
+# -> (facture id, created); an invoice already stored (unique supplier/numero/date) is not inserted twice
+def _insert_facture_row(cursor, conn, data):
+    # parse date / float helpers ...
+    invoice_number = data.get('invoice_number') or data.get('numero')
+    parsed_date = (data.get('invoice_date') or data.get('date'))  # ensure it's already validated/formatted by caller
+    fournisseur_id = get_or_create_fournisseur({
+        "nom": data.get('fournisseur_name') or data.get('client'),
+        "ice": data.get('fournisseur_ice') or data.get('ice'),
+        "if": data.get('fournisseur_if') or data.get('if'),
+        "adresse": data.get('fournisseur_address') or ""
+    }, conn=conn)
 
     try:
-        # parse date / float helpers ...
-        invoice_number = data.get('invoice_number') or data.get('numero')
-        parsed_date = (data.get('invoice_date') or data.get('date'))  # ensure it's already validated/formatted by caller
-        fournisseur_id = insert_fournisseur({
-            "nom": data.get('fournisseur_name') or data.get('client'),
-            "ice": data.get('fournisseur_ice') or data.get('ice'),
-            "if": data.get('fournisseur_if') or data.get('if'),
-            "adresse": data.get('fournisseur_address') or ""
-        }, conn=conn)
-
         cursor.execute("""
-            INSERT INTO Factures (numero, date, fournisseur_id, total_ht, tva, total_ttc)
+            INSERT INTO Factures (numero, numero_norm, date, fournisseur_id, total_ht, tva, total_ttc)
             OUTPUT INSERTED.id
-            VALUES (?, ?, ?, ?, ?, ?)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
         """, (
             invoice_number,
+            normalize_numero(invoice_number),
             parsed_date,
             fournisseur_id,
-            safe_float(data.get('total_ht') or data.get('total_ht')),
-            safe_float(data.get('vat_amount') or data.get('tva')),
-            safe_float(data.get('total_ttc') or data.get('total_ttc'))
+            parse_number(data.get('total_ht') or data.get('total_ht')),
+            parse_number(data.get('vat_amount') or data.get('tva')),
+            parse_number(data.get('total_ttc') or data.get('total_ttc'))
         ))
-        facture_id = cursor.fetchone()[0]
+        return cursor.fetchone()[0], True
+    except pyodbc.IntegrityError:
+        # same invoice inserted concurrently (or missed by the pre-check): reuse the stored one
+        existing_id = find_facture_id(fournisseur_id, invoice_number, parsed_date, conn=conn)
+        if existing_id is None:
+            raise
+        return existing_id, False
 
-        # insert products using same conn (no separate commit inside)
-        produits = data.get("products", [])
-        if produits:
-            insert_produits(facture_id, produits, conn=conn)
+
+# 📦 Many factures + all their products in a single transaction -> [(facture id, created)]
+def insert_factures(factures):
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        results = []
+        produit_rows = []
+        for data in factures:
+            facture_id, created = _insert_facture_row(cursor, conn, data)
+            results.append((facture_id, created))
+            if created:
+                produit_rows.extend(produit_params(facture_id, p) for p in data.get("products", []))
+
+        # products of every facture go out in batched executemany calls
+        bulk_insert_produits(produit_rows, conn)
 
         conn.commit()
-        return facture_id
+        return results
 
     except Exception:
         conn.rollback()
+        # lookups inside the rolled back transaction may have cached ids that no longer exist
+        invalidate_fournisseur_cache()
         raise
     finally:
         conn.close()
+
+
+def insert_facture(data):
+    return insert_factures([data])[0]
@@ -0,0 +1,102 @@
+import argparse
+import sys
+
+if __name__ == "__main__":
+    # 🔐 CLI run: load .env before the db modules read their settings
+    from dotenv import load_dotenv
+    load_dotenv()
+
+from .database import get_connection
+from .entreprise import create_entreprise_table
+from .facture import create_facture_table
+from .fournisseur import create_fournisseur_table
+from .produit import create_produit_table
+
+# 🛠️ Schema changes run explicitly (python -m db.migrations), app startup only verifies
+MIGRATIONS = [
+    ("Entreprise", create_entreprise_table),
+    ("Fournisseur", create_fournisseur_table),
+    ("Factures", create_facture_table),
+    ("Produit", create_produit_table),
+]
+
+# what the application code relies on, checked in one round trip at startup
+REQUIRED_COLUMNS = {
+    "Entreprise": ["id", "nom", "langue_ocr"],
+    "Fournisseur": ["id", "ice", "if", "nom_norm"],
+    "Factures": ["id", "numero", "numero_norm", "date", "fournisseur_id"],
+    "Produit": ["id", "factures_id"],
+}
+REQUIRED_INDEXES = [
+    "UX_Fournisseur_ice", "UX_Fournisseur_if", "IX_Fournisseur_nom_norm", "UX_Factures_fournisseur_numero_date",
+    "IX_Factures_date", "IX_Factures_fournisseur_id", "IX_Produit_factures_id",
+]
+
+
+class SchemaNotReady(Exception):
+    def __init__(self, missing):
+        super().__init__("Database schema is not up to date (missing: " + ", ".join(missing) + "). Run: python -m db.migrations")
+        self.missing = missing
+
+
+def migrate():
+    for name, create in MIGRATIONS:
+        print(f"🛠️ Migrating {name}...")
+        create()
+    print("✅ Schema up to date")
+
+
+def missing_schema():
+    tables = list(REQUIRED_COLUMNS)
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT TABLE_NAME, COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_NAME IN ("
+            + ", ".join("?" for _ in tables) + ")",
+            tables
+        )
+        columns = {(table.lower(), column.lower()) for table, column in cursor.fetchall()}
+        cursor.execute(
+            "SELECT name FROM sys.indexes WHERE name IN (" + ", ".join("?" for _ in REQUIRED_INDEXES) + ")",
+            REQUIRED_INDEXES
+        )
+        indexes = {row[0] for row in cursor.fetchall()}
+    finally:
+        conn.close()
+
+    missing = []
+    for table, required in REQUIRED_COLUMNS.items():
+        for column in required:
+            if (table.lower(), column.lower()) not in columns:
+                missing.append(f"{table}.{column}")
+    missing += [name for name in REQUIRED_INDEXES if name not in indexes]
+    return missing
+
+
+def verify_schema():
+    missing = missing_schema()
+    if missing:
+        raise SchemaNotReady(missing)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create or upgrade the SQL Server schema.")
+    parser.add_argument("--check", action="store_true", help="only report what is missing, exit 1 if anything is")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        missing = missing_schema()
+        for item in missing:
+            print(f"❌ Missing {item}")
+        if missing:
+            return 1
+        print("✅ Schema up to date")
+        return 0
+
+    migrate()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
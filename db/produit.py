@@ -1,5 +1,10 @@
+import os
+
 import pyodbc
 from .database import get_connection
+from extractor.numbers import parse_number
+
+PRODUIT_BATCH_SIZE = int(os.getenv("PRODUIT_BATCH_SIZE", 1000))
 
 def create_produit_table():
     conn = get_connection()
@@ -15,28 +20,45 @@ def create_produit_table():
         total FLOAT
     )
     """)
+    # products of one facture are always read together (GET /factures/{id}, duplicate cleanup)
+    cursor.execute("""
+    IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='IX_Produit_factures_id')
+        CREATE INDEX IX_Produit_factures_id ON Produit (factures_id)
+    """)
     conn.commit()
     conn.close()
 
 
+def produit_params(factures_id, p):
+    return (
+        factures_id,
+        p.get("designation") or p.get("name") or p.get("nom"),
+        int(parse_number(p.get("quantity")) or 0),
+        parse_number(p.get("unit_price")) or 0.0,
+        parse_number(p.get("total_price")) or parse_number(p.get("total")) or 0.0
+    )
+
+
+# 📦 Batched executemany: one round trip per PRODUIT_BATCH_SIZE lines instead of one per line
+def bulk_insert_produits(rows, conn):
+    if not rows:
+        return
+    cursor = conn.cursor()
+    cursor.fast_executemany = True
+    for i in range(0, len(rows), PRODUIT_BATCH_SIZE):
+        cursor.executemany("""
+            INSERT INTO Produit (factures_id, nom, quantite, prix_unitaire, total)
+            VALUES (?, ?, ?, ?, ?)
+        """, rows[i:i + PRODUIT_BATCH_SIZE])
+
+
 def insert_produits(factures_id, produits, conn=None):
     close_conn = False
     if conn is None:
         conn = get_connection()
         close_conn = True
 
-    cursor = conn.cursor()
-    for p in produits:
-        cursor.execute("""
-            INSERT INTO Produit (factures_id, nom, quantite, prix_unitaire, total)
-            VALUES (?, ?, ?, ?, ?)
-        """, (
-            factures_id,
-            p.get("designation") or p.get("name") or p.get("nom"),
-            int(p.get("quantity", 0)),
-            float(p.get("unit_price", 0)),
-            float(p.get("total_price", 0)) or float(p.get("total", 0))
-        ))
+    bulk_insert_produits([produit_params(factures_id, p) for p in produits], conn)
 
     if close_conn:
         conn.commit()
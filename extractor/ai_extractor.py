@@ -0,0 +1,235 @@
+import json
+import logging
+import os
+import re
+import time
+from functools import lru_cache
+
+from extractor.client_context import CLIENT_CONTEXT_CACHE_SIZE, client_fields
+from extractor.compaction import LLM_MAX_INPUT_TOKENS, chunk_text, compact_text, estimate_tokens, merge_chunk_results
+from extractor.json_stream import JsonObjectScanner
+from extractor.llm_client import call_llm
+from extractor.numbers import parse_numbers
+from observability.tracing import log
+
+# bump whenever the prompt or its input changes so cached LLM replies are not reused
+PROMPT_VERSION = "3"
+
+# "functions": JSON-schema function calling, "prompt": JSON requested in the prompt only
+LLM_OUTPUT_MODE = os.getenv("LLM_OUTPUT_MODE", "functions")
+LLM_MAX_OUTPUT_TOKENS = int(os.getenv("LLM_MAX_OUTPUT_TOKENS", 1024))
+
+_TEXT = {"type": ["string", "null"]}
+_NUMBER = {"type": ["number", "string", "null"]}
+INVOICE_FUNCTION = {
+    "name": "record_invoice",
+    "description": "Record the supplier invoice data extracted from the document.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "invoice_number": _TEXT,
+            "invoice_date": {"type": ["string", "null"], "description": "YYYY-MM-DD"},
+            "fournisseur_name": _TEXT,
+            "fournisseur_address": _TEXT,
+            "fournisseur_ice": _TEXT,
+            "fournisseur_cnss": _TEXT,
+            "fournisseur_if": _TEXT,
+            "total_ht": _NUMBER,
+            "vat_amount": _NUMBER,
+            "total_ttc": _NUMBER,
+            "currency": _TEXT,
+            "products": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "designation": {"type": "string"},
+                        "quantity": _NUMBER,
+                        "unit_price": _NUMBER,
+                        "total_price": _NUMBER
+                    },
+                    "required": ["designation", "quantity", "unit_price", "total_price"]
+                }
+            }
+        },
+        "required": [
+            "invoice_number", "invoice_date", "fournisseur_name", "fournisseur_address",
+            "fournisseur_ice", "fournisseur_cnss", "fournisseur_if",
+            "total_ht", "vat_amount", "total_ttc", "currency", "products"
+        ]
+    }
+}
+
+def extract_first_json(text):
+    return JsonObjectScanner().feed(text)
+
+BANKING_LINE = re.compile(r"\bRIB\b|\bIBAN\b|\bcompte\b|Crédit du Maroc", re.IGNORECASE)
+
+# 🧹 Product sanity filter: the three number columns are parsed and range-checked as whole columns
+def clean_products(products):
+    rows = [p for p in products if isinstance(p, dict)]
+    if not rows:
+        return []
+
+    descs = [str(p.get("designation", "")).strip() for p in rows]
+    qty = parse_numbers([p.get("quantity") for p in rows])
+    unit_price = parse_numbers([p.get("unit_price") for p in rows])
+    total_price = parse_numbers([p.get("total_price") for p in rows])
+
+    # Skip unrealistic quantities or prices (unparseable values are NaN and fail every comparison)
+    keep = (
+        (qty > 0) & (qty <= 100000)
+        & (unit_price > 0) & (unit_price <= 1_000_000)
+        & (total_price > 0) & (total_price <= 1_000_000_000)
+    )
+    return [
+        {"designation": desc, "quantity": q, "unit_price": u, "total_price": t}
+        for desc, ok, q, u, t in zip(descs, keep.tolist(), qty.tolist(), unit_price.tolist(), total_price.tolist())
+        # Skip if designation contains banking info or is empty
+        if ok and desc and not BANKING_LINE.search(desc)
+    ]
+
+# prompt text and its token count, built once per client profile
+@lru_cache(maxsize=CLIENT_CONTEXT_CACHE_SIZE)
+def _prompt_context(fields):
+    prompt = _render_prompt(*fields)
+    return prompt, estimate_tokens(prompt)
+
+
+def build_prompt(excluded_entreprise: dict) -> str:
+    return _prompt_context(client_fields(excluded_entreprise))[0]
+
+
+def _render_prompt(nom, ice, if_, cnss, adresse):
+    client_info = "\n".join([
+        f"Nom: {nom}",
+        f"ICE: {ice}",
+        f"IF: {if_}",
+        f"CNSS: {cnss}",
+        f"Adresse: {adresse}"
+    ])
+
+    return f"""
+You are parsing an invoice. The following enterprise is the client (do NOT extract this one):
+
+{client_info}
+
+Your job is to identify and return structured data about the *other* company (the supplier), check header and footer if needed.
+Parts of the document without invoice data were removed and are marked with [...].
+
+Please extract the following fields:
+- invoice_number
+- invoice_date
+- fournisseur_name
+- fournisseur_address
+- fournisseur_ice
+- fournisseur_cnss
+- fournisseur_if
+- total_ht
+- vat_amount
+- total_ttc
+- currency
+
+Also extract product details as a list of objects with:
+- designation
+- quantity
+- unit_price
+- total_price
+
+⚠️ Do NOT include payment instructions, bank details, RIB, IBAN, contact info, or footer text as products.
+
+Reply with a single JSON object using exactly these keys, null when a value is not in the document.
+""".strip()
+
+
+def _call_model(prompt: str, text: str):
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant that extracts supplier information from invoices."},
+        {"role": "user", "content": prompt},
+        {"role": "user", "content": text}
+    ]
+    options = {}
+    if LLM_OUTPUT_MODE == "functions":
+        options = {"functions": [INVOICE_FUNCTION], "function_call": {"name": INVOICE_FUNCTION["name"]}}
+    prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+
+    def attempt(request_timeout, deadline):
+        import openai
+
+        # deterministic decoding, streamed so we can stop as soon as the JSON object closes
+        stream = openai.ChatCompletion.create(
+            engine=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
+            messages=messages,
+            temperature=0,
+            max_tokens=LLM_MAX_OUTPUT_TOKENS,
+            top_p=1,
+            stream=True,
+            request_timeout=request_timeout,
+            **options
+        )
+
+        scanner = JsonObjectScanner()
+        try:
+            for chunk in stream:
+                if time.monotonic() > deadline:
+                    raise TimeoutError("LLM call exceeded LLM_CALL_TIMEOUT")
+                if not chunk.get("choices"):
+                    continue
+                delta = chunk["choices"][0].get("delta") or {}
+                piece = (delta.get("function_call") or {}).get("arguments") or delta.get("content")
+                if scanner.feed(piece):
+                    break
+        finally:
+            if hasattr(stream, "close"):
+                stream.close()
+        return scanner
+
+    # Azure counts max_tokens against the TPM quota, so the bucket is charged for it up front
+    scanner = call_llm(attempt, prompt_tokens + LLM_MAX_OUTPUT_TOKENS)
+
+    # streamed replies carry no usage block, so both sides are estimated locally
+    usage = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": estimate_tokens(scanner.text)
+    }
+    if not scanner.done:
+        return {"error": "Could not find JSON object in AI reply", "raw_reply": scanner.text.strip()}, usage
+    return json.loads(scanner.result), usage
+
+
+# 📦 Extraction avec Azure OpenAI
+def extract_entities_with_ai(text: str, excluded_entreprise: dict) -> dict:
+    try:
+        prompt, prompt_tokens = _prompt_context(client_fields(excluded_entreprise))
+        compacted = compact_text(text)
+        chunks = chunk_text(compacted, LLM_MAX_INPUT_TOKENS - prompt_tokens)
+
+        token_usage = {
+            "input_raw": estimate_tokens(text),
+            "input_compacted": estimate_tokens(compacted),
+            "chunks": len(chunks),
+            "prompt_tokens": 0,
+            "completion_tokens": 0
+        }
+        results = []
+        for chunk in chunks:
+            result, usage = _call_model(prompt, chunk)
+            token_usage["prompt_tokens"] += usage.get("prompt_tokens", 0)
+            token_usage["completion_tokens"] += usage.get("completion_tokens", 0)
+            if result.get("error"):
+                result["token_usage"] = token_usage
+                return result
+            results.append(result)
+
+        parsed = results[0] if len(results) == 1 else merge_chunk_results(results)
+
+        # Apply product cleanup
+        if "products" in parsed:
+            parsed["products"] = clean_products(parsed["products"])
+
+        parsed["token_usage"] = token_usage
+        return parsed
+
+    except Exception as e:
+        log(logging.WARNING, "❌ AI model call failed", error=f"{type(e).__name__}: {e}")
+        return {"error": "Failed to call AI model", "details": str(e)}
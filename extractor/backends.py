@@ -0,0 +1,122 @@
+import json
+import os
+import time
+from pathlib import Path
+
+from extractor.ai_extractor import PROMPT_VERSION, clean_products, extract_entities_with_ai
+from extractor.client_context import client_fields
+from extractor.extractor_router import extract_entities_timed
+from pipeline.cache import sha256_hex
+
+# 🔌 Extraction backends, selected per request or with EXTRACTION_BACKEND
+EXTRACTION_BACKEND = os.getenv("EXTRACTION_BACKEND", "azure")
+LLM_RECORD_DIR = os.getenv("LLM_RECORD_DIR")
+REPLAY_DIR = os.getenv("REPLAY_DIR", LLM_RECORD_DIR or "recordings")
+REPLAY_LATENCY_MS = float(os.getenv("REPLAY_LATENCY_MS", 0))
+REPLAY_ON_MISS = os.getenv("REPLAY_ON_MISS", "regex")  # "regex" or "error"
+
+
+def recording_key(text, entreprise):
+    fields = client_fields(entreprise)
+    return sha256_hex(PROMPT_VERSION, text, *fields)
+
+
+def _recording_path(directory, key):
+    return Path(directory) / f"{key}.json"
+
+
+class ExtractionBackend:
+    name = None
+    # CPU-bound backends run in the process pool, the others in the I/O pool
+    cpu_bound = False
+    # results worth keeping in the LLM cache
+    cacheable = False
+    # whether missing fields should still be filled by the regex extractor
+    needs_fallback = True
+    # remote model calls: bounded by LLM_CONCURRENCY and guarded by the circuit breaker (extractor.llm_client)
+    rate_limited = False
+    # the result is the rule engine's output (from_rules): process_invoice reuses its duplicate-check
+    # regex pass instead of running the rules a second time
+    rule_based = False
+
+    def extract(self, text: str, entreprise: dict) -> dict:
+        raise NotImplementedError
+
+    def from_rules(self, data: dict) -> dict:
+        raise NotImplementedError
+
+
+class AzureOpenAIBackend(ExtractionBackend):
+    name = "azure"
+    cacheable = True
+    rate_limited = True
+
+    def __init__(self):
+        self._configured = False
+
+    def _configure(self):
+        if self._configured:
+            return
+        import openai
+
+        openai.api_type = "azure"
+        openai.api_base = os.getenv("AZURE_OPENAI_ENDPOINT")
+        openai.api_key = os.getenv("AZURE_OPENAI_API_KEY")
+        openai.api_version = os.getenv("AZURE_OPENAI_API_VERSION")
+        self._configured = True
+
+    def extract(self, text, entreprise):
+        self._configure()
+        result = extract_entities_with_ai(text, entreprise)
+        if LLM_RECORD_DIR and not result.get("error"):
+            # recorded replies feed the replay backend for offline benchmarks
+            path = _recording_path(LLM_RECORD_DIR, recording_key(text, entreprise))
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({k: v for k, v in result.items() if k != "token_usage"}, f, ensure_ascii=False, default=str)
+        return result
+
+
+class RegexBackend(ExtractionBackend):
+    name = "regex"
+    cpu_bound = True
+    needs_fallback = False
+    rule_based = True
+
+    def extract(self, text, entreprise):
+        data, timings = extract_entities_timed(text)
+        data = self.from_rules(data)
+        data["rule_timings"] = timings
+        return data
+
+    def from_rules(self, data):
+        return {**data, "products": clean_products(data.get("products", []))}
+
+
+class ReplayBackend(ExtractionBackend):
+    name = "replay"
+
+    def extract(self, text, entreprise):
+        if REPLAY_LATENCY_MS:
+            time.sleep(REPLAY_LATENCY_MS / 1000)
+        path = _recording_path(REPLAY_DIR, recording_key(text, entreprise))
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            if REPLAY_ON_MISS == "regex":
+                return RegexBackend().extract(text, entreprise)
+            return {"error": "No recorded reply for this document", "recording": path.name}
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (AzureOpenAIBackend(), RegexBackend(), ReplayBackend())
+}
+
+
+def get_backend(name=None) -> ExtractionBackend:
+    name = name or EXTRACTION_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown extraction backend '{name}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name]
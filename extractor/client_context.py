@@ -0,0 +1,41 @@
+import os
+import re
+from functools import lru_cache
+
+# 🏢 Per-entreprise context, computed once per distinct client profile instead of on every document
+CLIENT_CONTEXT_CACHE_SIZE = int(os.getenv("CLIENT_CONTEXT_CACHE_SIZE", 1024))
+CLIENT_FIELDS = ("nom", "ice", "if", "cnss", "adresse")
+CLIENT_PLACEHOLDER = "[client]"
+
+# shorter numbers would also hit quantities and amounts
+MIN_IDENTIFIER_DIGITS = 5
+
+
+def client_fields(entreprise):
+    return tuple(str(entreprise.get(k) or "") for k in CLIENT_FIELDS)
+
+
+@lru_cache(maxsize=CLIENT_CONTEXT_CACHE_SIZE)
+def _identifier_pattern(identifiers):
+    alternatives = []
+    for value in identifiers:
+        digits = re.sub(r"\D", "", value)
+        if len(digits) >= MIN_IDENTIFIER_DIGITS:
+            # printed identifiers are often grouped: "001 526 789 000045", "40-211-234"
+            alternatives.append(r"[\s.\-]?".join(digits))
+    if not alternatives:
+        return None
+    return re.compile(r"(?<!\d)(?:" + "|".join(sorted(set(alternatives), key=len, reverse=True)) + r")(?!\d)")
+
+
+def client_identifier_pattern(entreprise):
+    return _identifier_pattern(tuple(str(entreprise.get(k) or "") for k in ("ice", "if", "cnss")))
+
+
+# the client's ICE / IF / CNSS are never the supplier's: removing them keeps both the LLM
+# and the regex rules (which take the first ICE they see) from picking them up
+def strip_client_identifiers(text, entreprise):
+    pattern = client_identifier_pattern(entreprise)
+    if pattern is None:
+        return text
+    return pattern.sub(CLIENT_PLACEHOLDER, text)
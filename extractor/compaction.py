@@ -0,0 +1,125 @@
+import os
+import re
+from collections import Counter
+
+# ✂️ Pre-LLM compaction: keep the regions of the document that carry invoice data
+LLM_MAX_INPUT_TOKENS = int(os.getenv("LLM_MAX_INPUT_TOKENS", 6000))
+COMPACT_HEADER_LINES = int(os.getenv("COMPACT_HEADER_LINES", 30))
+COMPACT_FOOTER_LINES = int(os.getenv("COMPACT_FOOTER_LINES", 20))
+COMPACT_BOILERPLATE_REPEATS = int(os.getenv("COMPACT_BOILERPLATE_REPEATS", 3))
+
+WHITESPACE_RE = re.compile(r"[ \t  ]+")
+# one column value: "25", "3790,98", "1.234,56", "20%" (columns are whitespace-separated, so no spaces inside)
+NUMBER_TOKEN_RE = re.compile(r"^[-+]?\d[\d.,]*%?$")
+KEYWORD_RE = re.compile(
+    r"factur|invoice|\bice\b|\bif\b|i\.f|cnss|\brc\b|patente|total|montant|\btva\b|\bvat\b|\bht\b|\bttc\b|"
+    r"net [àa] payer|date|n°|adresse|capital|sarl|soci[ée]t[ée]|fournisseur|client|devise|\bmad\b|\beur\b|\busd\b",
+    re.IGNORECASE
+)
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    # tiktoken is optional and slow to import, it is loaded on the first estimate
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = None
+        _encoding_loaded = True
+    return _encoding
+
+
+def estimate_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # ~4 characters per token for French/English invoice text
+    return (len(text) + 3) // 4
+
+
+def is_table_row(line):
+    return sum(1 for token in line.split() if NUMBER_TOKEN_RE.match(token)) >= 2
+
+
+def compact_text(text: str) -> str:
+    lines = [WHITESPACE_RE.sub(" ", line).strip() for line in text.splitlines()]
+    lines = [line for line in lines if line]
+    if not lines:
+        return ""
+
+    # page headers/footers repeated on every page are kept once
+    counts = Counter(lines)
+    seen = set()
+    deduped = []
+    for line in lines:
+        if counts[line] >= COMPACT_BOILERPLATE_REPEATS and not is_table_row(line):
+            if line in seen:
+                continue
+            seen.add(line)
+        deduped.append(line)
+    lines = deduped
+
+    keep = set(range(min(COMPACT_HEADER_LINES, len(lines))))
+    keep.update(range(max(0, len(lines) - COMPACT_FOOTER_LINES), len(lines)))
+    rows = []
+    for i, line in enumerate(lines):
+        if KEYWORD_RE.search(line):
+            # keep the neighbours too, values are often on the next line
+            keep.update(range(max(0, i - 1), min(len(lines), i + 2)))
+        if is_table_row(line):
+            rows.append(i)
+            keep.add(i)
+    # wrapped designations between two line items belong to the table
+    for a, b in zip(rows, rows[1:]):
+        if b - a <= 3:
+            keep.update(range(a, b))
+
+    result = []
+    previous = -1
+    for i in sorted(keep):
+        if i != previous + 1 and result:
+            result.append("[...]")
+        result.append(lines[i])
+        previous = i
+    return "\n".join(result)
+
+
+def chunk_text(text: str, max_tokens: int = LLM_MAX_INPUT_TOKENS) -> list:
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+
+    lines = text.split("\n")
+    # every chunk repeats the document header so the supplier block stays visible
+    header = "\n".join(lines[:min(10, len(lines))])
+    budget = max(max_tokens - estimate_tokens(header), max_tokens // 2)
+
+    chunks = []
+    current, current_tokens = [], 0
+    for line in lines:
+        line_tokens = estimate_tokens(line) + 1
+        if current and current_tokens + line_tokens > budget:
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += line_tokens
+    if current:
+        chunks.append("\n".join(current))
+    return [chunks[0]] + [f"{header}\n[...]\n{chunk}" for chunk in chunks[1:]]
+
+
+def merge_chunk_results(results: list) -> dict:
+    merged = {}
+    products = []
+    for result in results:
+        for key, value in result.items():
+            if key == "products":
+                products.extend(value or [])
+            elif merged.get(key) in (None, "", "null"):
+                merged[key] = value
+    merged["products"] = products
+    return merged
@@ -1,140 +1,109 @@
+import logging
+import os
 import re
-import pytesseract
-from datetime import datetime
-
-# ✅ Adjust path if Tesseract isn't in your environment PATH
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
-
-def extract_entities(text: str) -> dict:
-    print("🧠 Fallback extractor active. Extracting entities from text...\n")
-
-    vat_value = extract_vat(text)
-    data = {
-        "invoice_number": extract_invoice_number(text),
-        "invoice_date": extract_date(text),
-        "fournisseur_name": extract_fournisseur_name(text),
-        "fournisseur_address": extract_fournisseur_address(text),
-        "fournisseur_ice": extract_ice(text),
-        "fournisseur_cnss": extract_cnss(text),
-        "fournisseur_if": extract_if(text),
-        "total_ht": extract_total_ht(text),
-        "vat_amount": vat_value,
-        "total_ttc": extract_total_ttc(text),
-        "currency": extract_currency(text),
-        "products": extract_products(text),
-    }
-
-    # 🔍 Debug print all extracted values
-    print("🔍 Extracted Fields:")
-    for k, v in data.items():
-        print(f"{k}: {repr(v)}")
 
-    return data
+from extractor.compaction import NUMBER_TOKEN_RE, is_table_row
+from extractor.numbers import parse_number
+from extractor.rule_engine import detect_supplier, load_rule_set
+from observability.tracing import log, logger
 
-def normalize_float(val):
-    try:
-        return float(str(val).replace(",", ".").replace(" ", ""))
-    except:
-        return None
-
-def extract_invoice_number(text):
-    # Flexible match: long format or just a number near "facture"
-    match = re.search(r"(?:Facture|Invoice)[^\d]{0,5}(\d{3,10})", text, re.IGNORECASE)
-    if match:
-        return match.group(1).strip()
-    match = re.search(r"\bFC-\d{2}-\d{4}[A-Z]*-\d{3}-\d{2}-\d{2}\b", text)
-    return match.group(0) if match else None
-
-def extract_date(text):
-    match = re.search(r"\d{2}-\d{2}-\d{2}", text)
-    if match:
-        try:
-            return datetime.strptime(match.group(0), "%d-%m-%y").strftime("%Y-%m-%d")
-        except:
-            return match.group(0)
-    return None
-
-def extract_fournisseur_name(text):
-    match = re.search(r"Paiements à exécuter.*?:\s*(.+)", text, re.IGNORECASE)
-    if match:
-        return match.group(1).strip()
-
-    # Fallback: look for supplier phrases
-    match = re.search(r"\b(INGRAM MICRO|SOCIÉTÉ.*?AU CAPITAL|Société.*?SARL)\b.*", text, re.IGNORECASE)
-    return match.group(0).strip() if match else None
-
-def extract_fournisseur_address(text):
-    match = re.search(r"(Lot\s+\d+.*?(Casablanca|Rabat|Maroc).+)", text, re.IGNORECASE)
-    if match:
-        return match.group(1).strip()
-    # Fallback to anything after fournisseur name
-    match = re.search(r"(Siège\s+Social.*?)\n", text, re.IGNORECASE)
-    return match.group(1).strip() if match else None
-
-def extract_ice(text):
-    match = re.search(r"ICE[:\s]+(\d+)", text, re.IGNORECASE)
-    return match.group(1) if match else None
-
-def extract_cnss(text):
-    match = re.search(r"CNSS[:\s]+(\d+)", text, re.IGNORECASE)
-    return match.group(1) if match else None
-
-def extract_if(text):
-    match = re.search(r"\bIF[:\s]+(\d+)", text, re.IGNORECASE)
-    return match.group(1) if match else None
-
-def extract_total_ht(text):
-    match = re.search(r"MONTANT HT[:\s]+([\d\.,]+)", text, re.IGNORECASE)
-    return normalize_float(match.group(1)) if match else None
-
-def extract_vat(text):
-    match = re.search(r"(VAT|TVA)[\s:]*[\d\.%]*[\s:]*([\d\.,]+)", text, re.IGNORECASE)
-    return normalize_float(match.group(2)) if match else None
-
-def extract_total_ttc(text):
-    match = re.search(r"MONTANT TTC.*?([\d\.,]+)", text, re.IGNORECASE | re.DOTALL)
-    return normalize_float(match.group(1)) if match else None
-
-def extract_currency(text):
-    match = re.search(r"\b(MAD|EUR|USD)\b", text)
-    return match.group(0) if match else "MAD"
-
-def extract_products(text):
-    products = []
-    lines = text.split("\n")
-
-    for line in lines:
-        # Remove extra spaces, normalize line
-        line = line.strip()
-
-        # Match: description followed by qty, unit price, total price
-        match = re.match(r"(.+?)\s+(\d{1,3})\s+([\d\.,]+)\s+([\d\.,]+)$", line)
-        if match:
-            designation = match.group(1).strip()
-            quantity = normalize_float(match.group(2))
-            unit_price = normalize_float(match.group(3))
-            total_price = normalize_float(match.group(4))
-
-            # Only add if all values are valid
-            if designation and quantity and unit_price and total_price:
-                products.append({
-                    "designation": designation,
-                    "quantity": quantity,
-                    "unit_price": unit_price,
-                    "total_price": total_price
-                })
-
-    return products
+# ✅ Tesseract / poppler paths are configured in parser.ocr_engine (TESSERACT_CMD) and parser.ocr (POPPLER_PATH)
+from parser.file_router import iter_file
+from parser.ocr import ocr_pdf_pages, POPPLER_PATH
+
+# ⏹️ Early stop (opt-in): parsing ends once these fields have been seen, the rest of the document is never
+# parsed / OCR'd. Totals only count from a closing totals line, see FieldWatch.
+PARSE_EARLY_STOP = os.getenv("PARSE_EARLY_STOP", "false").lower() == "true"
+PARSE_STOP_FIELDS = [f.strip() for f in os.getenv("PARSE_STOP_FIELDS", "fournisseur_ice,invoice_number,total_ttc").split(",") if f.strip()]
+
+# totals labels; "Désignation Qté PU HT Montant TTC" is a column header, not a total: no value follows it
+TOTAL_LABELS = {
+    "total_ttc": re.compile(r"(?:montant|total)\s*t\.?t\.?c\b|net\s+[àa]\s+payer", re.IGNORECASE),
+    "total_ht": re.compile(r"(?:montant|total)\s*h\.?t\b", re.IGNORECASE),
+    "vat_amount": re.compile(r"\btva\b|\bvat\b", re.IGNORECASE),
+}
+
+def extract_entities_timed(text: str, supplier: str = None):
+    supplier = supplier or detect_supplier(text)
+    return load_rule_set(supplier).evaluate(text)
 
+def extract_entities(text: str, supplier: str = None) -> dict:
+    data, _ = extract_entities_timed(text, supplier)
+
+    # 🔍 Extracted values only at DEBUG: dumping every field on each call slowed busy workers down
+    if logger.isEnabledFor(logging.DEBUG):
+        log(logging.DEBUG, "🔍 Extracted fields", supplier=supplier, fields={k: repr(v) for k, v in data.items()})
+
+    return data
 
 def extract_text_from_pdf(content: bytes) -> str:
-    from pdf2image import convert_from_bytes
-    from PIL import Image
-    poppler_path = r"C:\poppler\Library\bin"
-
-    images = convert_from_bytes(content, poppler_path=poppler_path)
-    texte_complet = ""
-    for image in images:
-        texte = pytesseract.image_to_string(image, lang='fra')
-        texte_complet += texte + "\n"
-    return texte_complet
+    from pdf2image import pdfinfo_from_bytes
+
+    # pages are rendered one by one inside the OCR workers instead of all up front
+    page_count = pdfinfo_from_bytes(content, poppler_path=POPPLER_PATH)["Pages"]
+    texts = ocr_pdf_pages(content, range(page_count), renderer="poppler", resolution=200, lang="fra")
+    return "".join(texts[n] + "\n" for n in range(page_count))
+
+def closing_totals(chunk: str) -> dict:
+    # totals read from "label ... value" on one line, with no table row after it in the chunk:
+    # a table that continues on the next lines (or pages) has not been totalled yet
+    lines = chunk.splitlines()
+    totals = {}
+    for i, line in enumerate(lines):
+        for field, label in TOTAL_LABELS.items():
+            match = label.search(line)
+            if not match:
+                continue
+            values = [t for t in line[match.end():].split() if NUMBER_TOKEN_RE.match(t) and not t.endswith("%")]
+            if values:
+                totals[field] = (i, parse_number(values[-1]))
+    last_row = max((i for i, line in enumerate(lines) if is_table_row(line) and not any(
+        label.search(line) for label in TOTAL_LABELS.values()
+    )), default=-1)
+    return {field: value for field, (i, value) in totals.items() if i > last_row and value is not None}
+
+
+# Header fields / totals detected chunk by chunk as the parser produces them
+class FieldWatch:
+    def __init__(self, fields=PARSE_STOP_FIELDS):
+        self.fields = list(fields)
+        self.found = {}
+        self.supplier = None
+
+    def feed(self, chunk: str) -> bool:
+        # supplier rules apply once its keyword has shown up (usually in the first page header)
+        self.supplier = self.supplier or detect_supplier(chunk)
+        rule_set = load_rule_set(self.supplier)
+        data, _ = rule_set.evaluate(chunk)
+        # multi-line rules also match a column header followed by line items: totals come from closing lines only
+        data.update({field: None for field in TOTAL_LABELS})
+        data.update(closing_totals(chunk))
+        for field in self.fields:
+            value = data.get(field)
+            if field not in self.found and value not in (None, "", []) and value != rule_set.defaults.get(field):
+                self.found[field] = value
+        return self.done
+
+    @property
+    def done(self) -> bool:
+        return all(field in self.found for field in self.fields)
+
+
+# -> (text, stopped): the chunks read until every stop field was found; pulling one more chunk
+# would already start OCR of the next window, so stopped is True even if that was the last one
+def parse_until_found(filename: str, content, lang: str = None, fields=PARSE_STOP_FIELDS):
+    watch = FieldWatch(fields)
+    chunks = []
+    stream = iter_file(filename, content, lang)
+    stopped = False
+    try:
+        for chunk in stream:
+            chunks.append(chunk)
+            if watch.feed(chunk):
+                stopped = True
+                break
+    finally:
+        close = getattr(stream, "close", None)
+        if close:
+            close()
+    return "".join(chunks), stopped
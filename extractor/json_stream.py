@@ -0,0 +1,50 @@
+# 🧵 Incremental scanner: finds the first complete top-level JSON object in streamed text
+class JsonObjectScanner:
+    def __init__(self):
+        self._parts = []
+        self._length = 0
+        self._start = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.result = None
+
+    def feed(self, chunk: str):
+        if self.result is not None or not chunk:
+            return self.result
+        offset = self._length
+        self._parts.append(chunk)
+        self._length += len(chunk)
+
+        for i, c in enumerate(chunk):
+            if self._start is None:
+                if c == "{":
+                    self._start = offset + i
+                    self._depth = 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                self._in_string = True
+            elif c == "{":
+                self._depth += 1
+            elif c == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    text = "".join(self._parts)
+                    self.result = text[self._start:offset + i + 1]
+                    return self.result
+        return None
+
+    @property
+    def done(self):
+        return self.result is not None
+
+    @property
+    def text(self):
+        return "".join(self._parts)
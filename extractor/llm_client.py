@@ -0,0 +1,215 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from observability.metrics import LLM_RETRIES_TOTAL
+
+# 🚦 Azure OpenAI call discipline: quota-aware pacing, bounded concurrency, retries, circuit breaker
+LLM_TPM = int(os.getenv("LLM_TPM", 0))  # tokens per minute of the deployment, 0 = not enforced
+LLM_RPM = int(os.getenv("LLM_RPM", 0))  # requests per minute, 0 = not enforced
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", 8))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 4))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 1.0))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", 30))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 5))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", 30))  # max silence between streamed chunks
+LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", 90))  # whole call, stream included
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", 5))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", 30))
+
+
+class LLMUnavailable(Exception):
+    pass
+
+
+class TokenBucket:
+    # refills continuously at capacity/60 per second; capacity 0 disables the bucket
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        if not self.capacity:
+            return max(0.0, self.paused_until - now)
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        missing = max(0.0, amount - self.tokens) / self.rate
+        return max(missing, self.paused_until - now)
+
+    def take(self, amount):
+        if self.capacity:
+            self.tokens -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    def __init__(self, tpm, rpm):
+        self.tokens = TokenBucket(tpm)
+        self.requests = TokenBucket(rpm)
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens, deadline):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = max(self.tokens.wait_time(tokens, now), self.requests.wait_time(1, now))
+                if wait <= 0:
+                    self.tokens.take(tokens)
+                    self.requests.take(1)
+                    return
+            if now + wait > deadline:
+                raise LLMUnavailable("LLM quota exhausted for the call deadline")
+            time.sleep(min(wait, 1.0))
+
+    def pause(self, seconds):
+        # a 429 with Retry-After holds every caller, not only the one that got it
+        with self._lock:
+            until = time.monotonic() + seconds
+            self.tokens.paused_until = max(self.tokens.paused_until, until)
+            self.requests.paused_until = max(self.requests.paused_until, until)
+
+
+class CircuitBreaker:
+    def __init__(self, threshold, reset_seconds):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.probe_started = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            # half-open: after the cool-down a single probe goes through; a probe that never reports
+            # back (e.g. answered from the LLM cache) is replaced after another cool-down
+            now = time.monotonic()
+            if now - self.opened_at >= self.reset_seconds and (
+                not self.probing or now - self.probe_started >= self.reset_seconds
+            ):
+                self.probing = True
+                self.probe_started = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half_open" if self.probing else "open"
+
+
+rate_limiter = RateLimiter(LLM_TPM, LLM_RPM)
+breaker = CircuitBreaker(LLM_BREAKER_THRESHOLD, LLM_BREAKER_RESET_SECONDS)
+_slots = None
+
+
+@asynccontextmanager
+async def llm_slot():
+    # waiting requests stay on the event loop instead of holding IO pool threads
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(LLM_CONCURRENCY)
+    async with _slots:
+        yield
+
+
+def _retry_after(error):
+    headers = getattr(error, "headers", None) or {}
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _classify(error):
+    # -> retry reason, or None when retrying cannot help (bad request, auth, content filter...)
+    import openai
+
+    if isinstance(error, openai.error.RateLimitError):
+        return "rate_limit"
+    if isinstance(error, (openai.error.Timeout, TimeoutError)):
+        return "timeout"
+    if isinstance(error, (openai.error.APIConnectionError, openai.error.ServiceUnavailableError, openai.error.TryAgain)):
+        return "unavailable"
+    if isinstance(error, openai.error.APIError) and (getattr(error, "http_status", None) or 500) >= 500:
+        return "server_error"
+    # openai 0.28 only wraps errors raised before the response starts: a stream that stalls
+    # (request_timeout's read part) or drops mid-way surfaces as the raw requests / urllib3 error
+    import requests
+    import urllib3
+
+    if isinstance(error, (requests.exceptions.Timeout, urllib3.exceptions.TimeoutError)):
+        return "timeout"
+    if isinstance(error, (
+        requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError,
+        urllib3.exceptions.ProtocolError
+    )):
+        return "unavailable"
+    return None
+
+
+def call_llm(fn, estimated_tokens):
+    # fn(request_timeout, deadline) performs one complete call (stream consumed) and returns its result
+    deadline = time.monotonic() + LLM_CALL_TIMEOUT
+    attempt = 0
+    while True:
+        try:
+            rate_limiter.acquire(estimated_tokens, deadline)
+        except LLMUnavailable:
+            breaker.record_failure()
+            raise
+        try:
+            result = fn((LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT), deadline)
+        except Exception as e:
+            reason = _classify(e)
+            if reason is None:
+                # the request itself was refused (or failed locally): not a reason to open the breaker,
+                # nor proof that Azure is healthy again
+                raise
+            if attempt >= LLM_MAX_RETRIES:
+                breaker.record_failure()
+                raise
+            retry_after = _retry_after(e)
+            if retry_after:
+                rate_limiter.pause(retry_after)
+            # exponential backoff with full jitter, never shorter than what Azure asked for
+            delay = max(retry_after or 0.0, random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt)))
+            if time.monotonic() + delay > deadline:
+                breaker.record_failure()
+                raise
+            LLM_RETRIES_TOTAL.inc(reason=reason)
+            attempt += 1
+            time.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
+
+
+def llm_stats():
+    return {"breaker": breaker.state(), "failures": breaker.failures, "concurrency": LLM_CONCURRENCY}
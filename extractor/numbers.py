@@ -0,0 +1,99 @@
+import math
+import os
+import re
+
+# 🔢 The one number parser of the pipeline (LLM replies, regex rules, DB inserts).
+# Moroccan / French amounts: "1 234,56 DH", "1.234,56", "1,234.56 MAD", "12 500", "-3,5 €".
+# A single comma is the decimal mark, a comma after the last dot too; repeated separators
+# and the one before the decimal mark are thousand separators.
+# Columns of NUMBER_VECTOR_MIN values or more are parsed in one pandas pass (imported on first use),
+# shorter ones stay in plain Python where pandas' per-call overhead would dominate.
+NUMBER_VECTOR_MIN = int(os.getenv("NUMBER_VECTOR_MIN", 64))
+# consistency checks: relative tolerance, plus a few centimes of rounding per comparison
+AMOUNT_TOLERANCE = float(os.getenv("AMOUNT_TOLERANCE", 0.01))
+AMOUNT_ABS_TOLERANCE = 0.05
+
+# currency words / symbols, spaces (incl. the non-breaking ones) and anything else that is not a digit,
+# a separator or a sign
+_NOISE = re.compile(r"[^0-9,.\-]")
+
+
+def _canonical(text):
+    text = _NOISE.sub("", text)
+    commas, dots = text.count(","), text.count(".")
+    if commas == 1 and (not dots or text.rfind(",") > text.rfind(".")):
+        # decimal comma, dots group thousands
+        return text.replace(".", "").replace(",", ".")
+    text = text.replace(",", "")
+    return text.replace(".", "") if dots > 1 else text
+
+
+# -> float, or None when there is no number
+def parse_number(value):
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return None if math.isnan(value) else float(value)
+    try:
+        return float(_canonical(str(value)))
+    except ValueError:
+        return None
+
+
+# -> float64 array, NaN where there is no number
+def parse_numbers(values):
+    import numpy as np
+
+    values = list(values)
+    if len(values) < NUMBER_VECTOR_MIN:
+        return np.array([parse_number(v) for v in values], dtype=float)
+
+    import pandas as pd
+
+    column = pd.Series(values, dtype=object)
+    pending = column.map(lambda v: isinstance(v, str)).astype(bool)
+    plain = column.map(lambda v: isinstance(v, (int, float)) and not isinstance(v, bool)).astype(bool)
+    numbers = pd.to_numeric(column.where(plain), errors="coerce").astype(float)
+    if pending.any():
+        text = column[pending].astype(str).str.replace(_NOISE.pattern, "", regex=True)
+        commas, dots = text.str.count(","), text.str.count(r"\.")
+        decimal_comma = (commas == 1) & ((dots == 0) | (text.str.rfind(",") > text.str.rfind(".")))
+        text = text.where(
+            ~decimal_comma,
+            text.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+        )
+        text = text.where(decimal_comma, text.str.replace(",", "", regex=False))
+        text = text.where(decimal_comma | (dots <= 1), text.str.replace(".", "", regex=False))
+        numbers[pending] = pd.to_numeric(text, errors="coerce")
+    return numbers.to_numpy(dtype=float)
+
+
+# ⚖️ Vectorised consistency checks: quantity × unit price ≈ line total, Σ lines ≈ total HT,
+# HT + TVA ≈ TTC. -> list of {"check", ...} for the mismatches (empty when everything adds up)
+def amount_issues(products, total_ht=None, vat_amount=None, total_ttc=None):
+    import numpy as np
+
+    def close(a, b):
+        return np.isclose(a, b, rtol=AMOUNT_TOLERANCE, atol=AMOUNT_ABS_TOLERANCE)
+
+    issues = []
+    rows = [p for p in products or [] if isinstance(p, dict)]
+    ht, vat, ttc = parse_numbers([total_ht, vat_amount, total_ttc])
+
+    if rows:
+        qty = parse_numbers([p.get("quantity") for p in rows])
+        unit = parse_numbers([p.get("unit_price") for p in rows])
+        line = parse_numbers([p.get("total_price") for p in rows])
+        known = ~(np.isnan(qty) | np.isnan(unit) | np.isnan(line))
+        bad = np.flatnonzero(known & ~close(qty * unit, line))
+        if bad.size:
+            issues.append({"check": "line_total", "lines": bad.tolist()})
+
+        # only meaningful when every line total was read
+        lines_sum = line.sum()
+        if not math.isnan(ht) and not math.isnan(lines_sum) and not close(lines_sum, ht):
+            issues.append({"check": "lines_vs_total_ht", "lines_sum": round(float(lines_sum), 2), "total_ht": float(ht)})
+
+    if not (math.isnan(ht) or math.isnan(vat) or math.isnan(ttc)) and not close(ht + vat, ttc):
+        issues.append({"check": "ht_plus_tva_vs_ttc", "total_ht": float(ht), "vat_amount": float(vat), "total_ttc": float(ttc)})
+    return issues
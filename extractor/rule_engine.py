@@ -0,0 +1,207 @@
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from extractor.numbers import parse_number
+
+# 📐 Declarative regex rules, one JSON file per supplier on top of default.json
+RULES_DIR = Path(os.getenv("RULES_DIR", Path(__file__).parent / "rules"))
+
+FIELDS = [
+    "invoice_number", "invoice_date", "fournisseur_name", "fournisseur_address",
+    "fournisseur_ice", "fournisseur_cnss", "fournisseur_if",
+    "total_ht", "vat_amount", "total_ttc", "currency", "products"
+]
+
+
+def _date_dmy2(val):
+    try:
+        return datetime.strptime(val, "%d-%m-%y").strftime("%Y-%m-%d")
+    except:
+        return val
+
+
+CONVERTERS = {
+    None: lambda v: v,
+    "strip": lambda v: v.strip(),
+    "float": parse_number,
+    "date_dmy2": _date_dmy2,
+}
+
+
+class Rule:
+    def __init__(self, spec, priority):
+        self.name = spec.get("name", spec["field"])
+        self.field = spec["field"]
+        self.kind = spec.get("kind", "field")
+        self.priority = priority
+        flags = 0
+        for flag in spec.get("flags", []):
+            flags |= getattr(re, flag)
+        self.pattern = re.compile(spec["pattern"], flags)
+        self.group = spec.get("group", 0)
+        self.convert = CONVERTERS[spec.get("convert")]
+        self.triggers = [t.lower() for t in spec.get("trigger", [])]
+        self.window = spec.get("window", 0)
+        self.columns = {
+            name: (group, CONVERTERS[convert]) for name, (group, convert) in spec.get("columns", {}).items()
+        }
+
+    def match_field(self, segment, pos=0):
+        match = self.pattern.search(segment, pos)
+        return self.convert(match.group(self.group)) if match else None
+
+    def match_row(self, line):
+        match = self.pattern.match(line)
+        if not match:
+            return None
+        row = {name: convert(match.group(group)) for name, (group, convert) in self.columns.items()}
+        # Only add if all values are valid
+        return row if all(row.values()) else None
+
+
+class RuleSet:
+    def __init__(self, rules, defaults=None):
+        self.rules = rules
+        self.defaults = defaults or {}
+        self._always = [r for r in rules if not r.triggers]
+        self._by_trigger = {}
+        for rule in rules:
+            for trigger in rule.triggers:
+                self._by_trigger.setdefault(trigger, []).append(rule)
+        # one alternation of every trigger keyword
+        triggers = sorted(self._by_trigger, key=len, reverse=True)
+        self._trigger_re = re.compile("|".join(re.escape(t) for t in triggers), re.IGNORECASE) if triggers else None
+
+    def _candidates(self, line):
+        # the combined alternation rejects most lines in one search
+        if self._trigger_re is None or not self._trigger_re.search(line):
+            return self._always
+        lowered = line.lower()
+        found = [rule for trigger, rules in self._by_trigger.items() if trigger in lowered for rule in rules]
+        return list(dict.fromkeys(found)) + self._always
+
+    # 🔎 Single pass over the lines: each rule only sees lines carrying its trigger keyword.
+    # window: 0 = the trigger line, N = it and the N next lines, "rest" = the text from the trigger line
+    # on (for patterns whose [:\s]+ / DOTALL gaps can reach past blank lines or a column of labels)
+    def evaluate(self, text):
+        lines = text.split("\n")
+        starts = [0]
+        for line in lines[:-1]:
+            starts.append(starts[-1] + len(line) + 1)
+        best = {}  # field -> (priority, value)
+        rows = {}
+        done = set()
+        timings = {}
+
+        for i, line in enumerate(lines):
+            for rule in self._candidates(line):
+                if rule.name in done:
+                    continue
+                if rule.kind == "field" and rule.field in best and best[rule.field][0] < rule.priority:
+                    continue
+                started = time.perf_counter()
+                if rule.kind == "row":
+                    row = rule.match_row(line.strip())
+                    if row:
+                        rows.setdefault(rule.field, []).append(row)
+                elif rule.window == "rest":
+                    # nothing from here to the end means nothing further down either: one search per rule
+                    value = rule.match_field(text, starts[i])
+                    if value is not None:
+                        best[rule.field] = (rule.priority, value)
+                    done.add(rule.name)
+                else:
+                    segment = "\n".join(lines[i:i + rule.window + 1]) if rule.window else line
+                    value = rule.match_field(segment)
+                    if value is not None:
+                        best[rule.field] = (rule.priority, value)
+                        done.add(rule.name)
+                timings[rule.name] = timings.get(rule.name, 0.0) + time.perf_counter() - started
+
+        data = {}
+        for field in FIELDS:
+            if field in rows:
+                data[field] = rows[field]
+            elif field in best:
+                data[field] = best[field][1]
+            elif any(r.field == field and r.kind == "row" for r in self.rules):
+                data[field] = []
+            else:
+                data[field] = self.defaults.get(field)
+        return data, timings
+
+
+def _slug(name):
+    return re.sub(r"[^a-z0-9]+", "_", str(name).lower()).strip("_")
+
+
+def _read_rule_file(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+_rule_sets = {}
+_detectors = None
+_lock = threading.Lock()
+
+
+def load_rule_set(supplier=None):
+    key = _slug(supplier) if supplier else "default"
+    with _lock:
+        if key not in _rule_sets:
+            default = _read_rule_file(RULES_DIR / "default.json")
+            specs = list(default["rules"])
+            defaults = dict(default.get("defaults", {}))
+            supplier_path = RULES_DIR / f"{key}.json"
+            if key != "default" and supplier_path.exists():
+                # supplier rules are tried before the generic ones
+                custom = _read_rule_file(supplier_path)
+                specs = custom.get("rules", []) + specs
+                defaults.update(custom.get("defaults", {}))
+            _rule_sets[key] = RuleSet([Rule(spec, i) for i, spec in enumerate(specs)], defaults)
+        return _rule_sets[key]
+
+
+def detect_supplier(text):
+    global _detectors
+    with _lock:
+        if _detectors is None:
+            _detectors = []
+            for path in sorted(RULES_DIR.glob("*.json")):
+                if path.stem == "default":
+                    continue
+                for keyword in _read_rule_file(path).get("detect", []):
+                    _detectors.append((re.compile(re.escape(keyword), re.IGNORECASE), path.stem))
+    for pattern, supplier in _detectors:
+        if pattern.search(text):
+            return supplier
+    return None
+
+
+def reload_rules():
+    global _detectors
+    with _lock:
+        _rule_sets.clear()
+        _detectors = None
+
+
+# ⏱️ Per-rule timings aggregated in the API process (evaluation itself runs in pool workers)
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def record_timings(timings):
+    with _stats_lock:
+        for name, seconds in timings.items():
+            calls, total = _stats.get(name, (0, 0.0))
+            _stats[name] = (calls + 1, total + seconds)
+
+
+def rule_stats():
+    with _stats_lock:
+        return {name: {"documents": calls, "seconds": round(total, 6)} for name, (calls, total) in _stats.items()}
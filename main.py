@@ -1,51 +1,120 @@
+import asyncio
 import json
+import logging
 import os
-import re
-import shutil
-import tempfile
-from datetime import datetime
+import time
+import uuid
+from datetime import date
+from typing import List
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, File, UploadFile, Form
+
+# 🔐 Load environment variables (before project imports, their settings are read at import time)
+load_dotenv()
+
+from fastapi import FastAPI, File, UploadFile, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-import openai
-from sqlalchemy import create_engine
 
-from db.fournisseur import create_fournisseur_table
-from db.produit import create_produit_table
+from db.database import pool as db_pool
+from db.facture import get_facture, list_factures, totals_by_fournisseur, totals_by_month
+from db.fournisseur import warm_fournisseur_cache
+from db.migrations import migrate, verify_schema
 
-from extractor.extractor_router import extract_text_from_pdf
+from extractor.backends import get_backend
+from extractor.llm_client import llm_stats
+from extractor.rule_engine import rule_stats
 from db.entreprise import (
     insert_entreprise,
-    get_all_entreprises,
+    get_entreprises_listing,
     get_entreprise_by_id,
-    create_entreprise_table
+    warm_entreprise_cache
+)
+from observability.collectors import register_collectors
+from observability.metrics import HTTP_REQUEST_SECONDS, registry
+from observability.tracing import configure_logging, log, logger, request_id_var, span
+from parser.ocr import valid_ocr_lang
+from pipeline.cache import cache_stats
+from pipeline.executors import PoolSaturated, pool_stats, run_io, shutdown_pools
+from pipeline.invoice import InvoiceError, process_invoice
+from pipeline.uploads import MAX_BATCH_UPLOAD_BYTES, MAX_UPLOAD_BYTES, UploadTooLarge, measure_upload
+from pipeline.jobs import (
+    InvalidArchive,
+    enqueue_batch,
+    expand_uploads,
+    get_batch_progress,
+    get_job,
+    start_workers,
+    stop_workers
 )
-from db.insert_facture import insert_facture
-from extractor.extractor_router import extract_entities as extract_entities_fallback
-from parser.file_router import parse_file
-
-# 🔐 Load environment variables
-load_dotenv()
-DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(DATABASE_URL)
-
-# 🧠 Setup Azure OpenAI client
-openai.api_type = "azure"
-openai.api_base = os.getenv("AZURE_OPENAI_ENDPOINT")
-openai.api_key = os.getenv("AZURE_OPENAI_API_KEY")
-openai.api_version = os.getenv("AZURE_OPENAI_API_VERSION")
 
 # 🚀 FastAPI app setup
+configure_logging()
+register_collectors()
 app = FastAPI()
 
+# schema changes are applied by `python -m db.migrations`; set DB_AUTO_MIGRATE=true for local dev
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "false").lower() in ("1", "true", "yes")
+
 @app.on_event("startup")
 def startup():
-    create_entreprise_table()
-    create_fournisseur_table()
-    create_produit_table()
+    db_pool.warm()
+    if DB_AUTO_MIGRATE:
+        migrate()
+    else:
+        verify_schema()
+    warm_entreprise_cache()
+    warm_fournisseur_cache()
+
+@app.on_event("startup")
+async def start_job_workers():
+    start_workers()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await stop_workers()
+    shutdown_pools(wait=False)
+    db_pool.close_all()
+
+@app.exception_handler(PoolSaturated)
+async def pool_saturated_handler(request, exc):
+    return JSONResponse(status_code=503, content={"error": str(exc)}, headers={"Retry-After": "5"})
+
+@app.exception_handler(UploadTooLarge)
+async def upload_too_large_handler(request, exc):
+    return JSONResponse(status_code=413, content={"error": str(exc)})
+
+# 📏 Reject oversized uploads before the multipart body is read
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    if request.method == "POST" and request.url.path.startswith("/extract"):
+        length = request.headers.get("content-length")
+        limit = MAX_BATCH_UPLOAD_BYTES if request.url.path == "/extract/batch" else MAX_UPLOAD_BYTES
+        if length and length.isdigit() and int(length) > limit:
+            return JSONResponse(status_code=413, content={"error": str(UploadTooLarge(limit))})
+    return await call_next(request)
+
+# 🧭 Request id + latency for every request (X-Request-ID is honoured if the caller sends one)
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Request-ID"] = request_id
+        return response
+    finally:
+        duration = time.perf_counter() - started
+        # route template, not the raw path, keeps /jobs/{job_id} to a single series
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        HTTP_REQUEST_SECONDS.observe(duration, method=request.method, route=route, status=status)
+        log(logging.INFO, "request", method=request.method, path=request.url.path, status=status,
+            duration_ms=round(duration * 1000, 2))
+        request_id_var.reset(token)
 
 # 🌐 CORS configuration
 app.add_middleware(
@@ -56,218 +125,89 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-def safe_float(val):
-    try:
-        if not val:
-            return 0.0
-        s = str(val)
-        filtered = re.sub(r"[^0-9,.\-]", "", s)
-        filtered = filtered.replace(",", ".")
-        return float(filtered)
-    except Exception as e:
-        print(f"Erreur conversion float pour '{val}': {e}")
-        return 0.0
-
-def safe_date(date_str):
-    if not date_str:
-        return None
-    date_str = str(date_str).strip()
-    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%d-%m-%Y"):
-        try:
-            dt = datetime.strptime(date_str, fmt)
-            return dt.date()
-        except:
-            continue
-    return None
-
-def extract_first_json(text):
-    stack = []
-    start_idx = None
-    for i, c in enumerate(text):
-        if c == '{':
-            if start_idx is None:
-                start_idx = i
-            stack.append(c)
-        elif c == '}' and stack:
-            stack.pop()
-            if not stack and start_idx is not None:
-                return text[start_idx:i+1]
-    return None
-
-# 🧹 Product sanity filter
-def clean_products(products):
-    cleaned = []
-    for p in products:
-        if not isinstance(p, dict):
-            continue
-
-        desc = str(p.get("designation", "")).strip()
-        qty = safe_float(p.get("quantity"))
-        unit_price = safe_float(p.get("unit_price"))
-        total_price = safe_float(p.get("total_price"))
-
-        # Skip if designation contains banking info or is empty
-        if not desc or re.search(r"\bRIB\b|\bIBAN\b|\bcompte\b|Crédit du Maroc", desc, re.IGNORECASE):
-            continue
-
-        # Skip unrealistic quantities or prices
-        if qty <= 0 or qty > 100000:
-            continue
-        if unit_price <= 0 or unit_price > 1_000_000:
-            continue
-        if total_price <= 0 or total_price > 1_000_000_000:
-            continue
-
-        cleaned.append({
-            "designation": desc,
-            "quantity": qty,
-            "unit_price": unit_price,
-            "total_price": total_price
-        })
-    return cleaned
-
-# 📦 Extraction avec Azure OpenAI
-def extract_entities_with_ai(text: str, excluded_entreprise: dict) -> dict:
-    try:
-        client_info = "\n".join([
-            f"Nom: {excluded_entreprise.get('nom') or ''}",
-            f"ICE: {excluded_entreprise.get('ice') or ''}",
-            f"IF: {excluded_entreprise.get('if') or ''}",
-            f"CNSS: {excluded_entreprise.get('cnss') or ''}",
-            f"Adresse: {excluded_entreprise.get('adresse') or ''}"
-        ])
-
-        prompt = f"""
-You are parsing an invoice. The following enterprise is the client (do NOT extract this one):
-
-{client_info}
-
-Your job is to identify and return structured data about the *other* company (the supplier), check header and footer if needed.
-
-Please extract the following fields:
-- invoice_number
-- invoice_date
-- fournisseur_name
-- fournisseur_address
-- fournisseur_ice
-- fournisseur_cnss
-- fournisseur_if
-- total_ht
-- vat_amount
-- total_ttc
-- currency
-
-Also extract product details as a list of objects with:
-- designation
-- quantity
-- unit_price
-- total_price
-
-⚠️ Do NOT include payment instructions, bank details, RIB, IBAN, contact info, or footer text as products.
-"""
-
-        completion = openai.ChatCompletion.create(
-            engine=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that extracts supplier information from invoices."},
-                {"role": "user", "content": prompt.strip()},
-                {"role": "user", "content": text}
-            ],
-            temperature=0.7,
-            max_tokens=1024,
-            top_p=1,
-            stream=False
-        )
-
-        raw_reply = completion.choices[0].message.content.strip()
-        json_str = extract_first_json(raw_reply)
-        if not json_str:
-            return {"error": "Could not find JSON object in AI reply", "raw_reply": raw_reply}
-
-        parsed = json.loads(json_str)
-
-        # Apply product cleanup
-        if "products" in parsed:
-            parsed["products"] = clean_products(parsed["products"])
-
-        return parsed
-
-    except Exception as e:
-        return {"error": "Failed to call AI model", "details": str(e)}
-
 # 📥 Upload + extraction
 @app.post("/extract")
-async def extract_invoice(file: UploadFile = File(...), entreprise_id: int = Form(...)):
-    suffix = file.filename.split(".")[-1].lower()
-    with tempfile.NamedTemporaryFile(delete=False, suffix=f".{suffix}") as tmp:
-        shutil.copyfileobj(file.file, tmp)
-        tmp_path = tmp.name
-
+async def extract_invoice(file: UploadFile = File(...), entreprise_id: int = Form(...), backend: str = Form(None)):
     try:
-        text = parse_file(file.filename, open(tmp_path, "rb").read())
-        local_entreprise = get_entreprise_by_id(entreprise_id)
-
-        if not local_entreprise:
-            return JSONResponse(status_code=400, content={"error": "Invalid entreprise_id"})
-
-        ai_entities = extract_entities_with_ai(text, local_entreprise)
-
-        required_keys = [
-            "invoice_number", "invoice_date", "fournisseur_name", "fournisseur_address",
-            "fournisseur_ice", "fournisseur_cnss", "fournisseur_if",
-            "total_ht", "vat_amount", "total_ttc", "currency"
-        ]
-        missing = []
-        for k in required_keys:
-            val = ai_entities.get(k)
-            if val is None or str(val).strip() in ["", "null"]:
-                missing.append(k)
-
-        if missing:
-            print(f"⚠️ Missing keys from AI: {missing}")
-            ai_entities = extract_entities_fallback(text)
-
-        if isinstance(ai_entities, dict) and not ai_entities.get("error"):
-            if not ai_entities.get("invoice_number"):
-                match = re.search(r"(Facture|Invoice)[^\d]{0,5}(\d{2,}/\d{2,}|\d+)", text, re.IGNORECASE)
-                if match:
-                    ai_entities["invoice_number"] = match.group(2)
-                    print(f"✅ Numéro de facture récupéré depuis le texte: {ai_entities['invoice_number']}")
-
-            if not ai_entities.get("invoice_date") and not ai_entities.get("date"):
-                date_match = re.search(r"(\d{2}/\d{2}/\d{4})|(\d{4}-\d{2}-\d{2})", text)
-                if date_match:
-                    found_date = date_match.group(0)
-                    ai_entities["invoice_date"] = found_date
-                    print(f"✅ Date récupérée par fallback regex: {found_date}")
-
-            date_valide = ai_entities.get("invoice_date") or ai_entities.get("date")
-            if not date_valide:
-                return JSONResponse(status_code=400, content={"error": "Date manquante ou invalide dans les données extraites."})
-
-            insert_facture({
-                "numero": ai_entities.get("invoice_number") or ai_entities.get("numero"),
-                "date": safe_date(date_valide),
-                "fournisseur_name": ai_entities.get("fournisseur_name") or ai_entities.get("fournisseur"),
-                "fournisseur_address": ai_entities.get("fournisseur_address") or ai_entities.get("adresse"),
-                "fournisseur_ice": ai_entities.get("fournisseur_ice") or ai_entities.get("ice"),
-                "fournisseur_cnss": ai_entities.get("fournisseur_cnss") or ai_entities.get("cnss"),
-                "fournisseur_if": ai_entities.get("fournisseur_if") or ai_entities.get("if"),
-                "total_ht": ai_entities.get("total_ht") or ai_entities.get("montant_ht"),
-                "vat_amount": ai_entities.get("vat_amount") or ai_entities.get("tva"),
-                "total_ttc": ai_entities.get("total_ttc") or ai_entities.get("montant_ttc"),
-                "products": clean_products(ai_entities.get("products", []))
-            })
-
-        return JSONResponse(content={
-            "text_preview": text[:1000],
-            "entities": ai_entities
-        })
-
+        # the spooled upload is hashed and size-checked in one pass, then parsed in place
+        with span("upload"):
+            _, digest = await run_io(measure_upload, file.file)
+        return JSONResponse(content=await process_invoice(file.filename, file.file, entreprise_id, digest, backend))
+
+    except InvoiceError as e:
+        return JSONResponse(status_code=e.status_code, content={"error": e.message})
+    except (PoolSaturated, UploadTooLarge):
+        raise
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ Extraction failed")
         return JSONResponse(status_code=500, content={"error": str(e)})
+    finally:
+        await file.close()
+
+# 📦 Batch upload -> background jobs
+@app.post("/extract/batch")
+async def extract_batch(files: List[UploadFile] = File(...), entreprise_id: int = Form(...), backend: str = Form(None)):
+    if not await run_io(get_entreprise_by_id, entreprise_id):
+        return JSONResponse(status_code=400, content={"error": "Invalid entreprise_id"})
+    try:
+        get_backend(backend)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    uploads = []
+    for f in files:
+        # zip archives bundle many invoices, so they get the batch limit
+        limit = MAX_BATCH_UPLOAD_BYTES if f.filename.lower().endswith(".zip") else MAX_UPLOAD_BYTES
+        await run_io(measure_upload, f.file, limit)
+        uploads.append((f.filename, await f.read()))
+        await f.close()
+    try:
+        documents = await run_io(expand_uploads, uploads)
+    except InvalidArchive as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    if not documents:
+        return JSONResponse(status_code=400, content={"error": "No supported file in upload"})
+
+    batch_id, jobs = await run_io(enqueue_batch, entreprise_id, documents, backend)
+    return JSONResponse(status_code=202, content={"batch_id": batch_id, "jobs": jobs})
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = await run_io(get_job, job_id)
+    if not job:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    return JSONResponse(content=job)
+
+@app.get("/batches/{batch_id}")
+async def batch_status(batch_id: str):
+    progress = await run_io(get_batch_progress, batch_id)
+    if not progress["total"]:
+        return JSONResponse(status_code=404, content={"error": "Batch not found"})
+    return progress
+
+@app.get("/batches/{batch_id}/progress")
+async def batch_progress_stream(batch_id: str):
+    # Server-Sent Events: one progress snapshot per second until every job is done/failed
+    async def events():
+        while True:
+            progress = await run_io(get_batch_progress, batch_id)
+            yield f"data: {json.dumps(progress)}\n\n"
+            if progress["finished"] or not progress["total"]:
+                break
+            await asyncio.sleep(1)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.get("/stats")
+def stats():
+    return {
+        "cache": cache_stats(), "pools": pool_stats(), "db_pool": db_pool.stats(),
+        "rules": rule_stats(), "llm": llm_stats()
+    }
+
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 # 🌐 Static web frontend
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -276,9 +216,14 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 async def home():
     return FileResponse("static/index.html")
 
+# served from the entreprise cache; the page reload sends If-None-Match and gets a bodyless 304
 @app.get("/entreprises")
-def list_entreprises():
-    return get_all_entreprises()
+def list_entreprises(request: Request):
+    listing, etag = get_entreprises_listing()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=listing, headers=headers)
 
 @app.get("/entreprise/{ent_id}")
 def get_entreprise(ent_id: int):
@@ -297,8 +242,11 @@ def add_entreprise(
     adresse: str = Form(None),
     tel: str = Form(None),
     email: str = Form(None),
-    siteweb: str = Form(None)
+    siteweb: str = Form(None),
+    langue_ocr: str = Form(None)
 ):
+    if langue_ocr and not valid_ocr_lang(langue_ocr):
+        return JSONResponse(status_code=400, content={"error": "langue_ocr must look like 'fra' or 'eng+fra'"})
     insert_entreprise({
         "nom": nom,
         "type": type,
@@ -308,6 +256,59 @@ def add_entreprise(
         "adresse": adresse,
         "tel": tel,
         "email": email,
-        "siteweb": siteweb
+        "siteweb": siteweb,
+        "langue_ocr": langue_ocr
     })
     return {"status": "success"}
+
+# 📄 Invoice read API: keyset pages (pass next_cursor back as cursor), filters shared with the totals
+def facture_filters(date_from, date_to, fournisseur_id, ice, min_total, max_total):
+    return {
+        "date_from": date_from, "date_to": date_to, "fournisseur_id": fournisseur_id,
+        "ice": ice, "min_total": min_total, "max_total": max_total
+    }
+
+@app.get("/factures")
+async def factures(
+    cursor: int = None,
+    limit: int = None,
+    date_from: date = None,
+    date_to: date = None,
+    fournisseur_id: int = None,
+    ice: str = None,
+    min_total: float = None,
+    max_total: float = None
+):
+    filters = facture_filters(date_from, date_to, fournisseur_id, ice, min_total, max_total)
+    return await run_io(list_factures, cursor, limit, **filters)
+
+@app.get("/factures/totals/fournisseurs")
+async def factures_totals_fournisseurs(
+    date_from: date = None,
+    date_to: date = None,
+    fournisseur_id: int = None,
+    ice: str = None,
+    min_total: float = None,
+    max_total: float = None
+):
+    filters = facture_filters(date_from, date_to, fournisseur_id, ice, min_total, max_total)
+    return await run_io(totals_by_fournisseur, **filters)
+
+@app.get("/factures/totals/mois")
+async def factures_totals_mois(
+    date_from: date = None,
+    date_to: date = None,
+    fournisseur_id: int = None,
+    ice: str = None,
+    min_total: float = None,
+    max_total: float = None
+):
+    filters = facture_filters(date_from, date_to, fournisseur_id, ice, min_total, max_total)
+    return await run_io(totals_by_month, **filters)
+
+@app.get("/factures/{facture_id}")
+async def facture_detail(facture_id: int):
+    facture = await run_io(get_facture, facture_id)
+    if not facture:
+        return JSONResponse(status_code=404, content={"error": "Facture not found"})
+    return facture
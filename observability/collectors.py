@@ -0,0 +1,40 @@
+from db.database import pool_stats as db_pool_stats
+from extractor.llm_client import breaker
+from extractor.rule_engine import rule_stats
+from observability.metrics import registry
+from pipeline.cache import cache_stats
+from pipeline.executors import pool_stats
+
+# 📈 Existing /stats counters exposed at scrape time (no double bookkeeping)
+
+
+def _cache(field):
+    return lambda: [((name,), s[field]) for name, s in cache_stats().items()]
+
+
+def _pool(field):
+    return lambda: [((name,), s[field]) for name, s in pool_stats().items()]
+
+
+def _db_pool(field):
+    return lambda: [((), db_pool_stats()[field])]
+
+
+def register_collectors():
+    registry.collector("cache_hits_total", "Cache hits", "counter", ["cache"], _cache("hits"))
+    registry.collector("cache_misses_total", "Cache misses", "counter", ["cache"], _cache("misses"))
+    registry.collector("cache_evictions_total", "Cache evictions", "counter", ["cache"], _cache("evictions"))
+    registry.collector("cache_bytes", "Bytes stored on disk per cache", "gauge", ["cache"], _cache("bytes"))
+    registry.collector("pool_inflight", "Tasks running or queued per executor pool", "gauge", ["pool"], _pool("inflight"))
+    registry.collector("pool_rejected_total", "Tasks rejected with 503 per executor pool", "counter", ["pool"], _pool("rejected"))
+    registry.collector("db_pool_in_use", "Checked-out SQL Server connections", "gauge", [], _db_pool("in_use"))
+    registry.collector("db_pool_idle", "Idle SQL Server connections", "gauge", [], _db_pool("idle"))
+    registry.collector("db_pool_timeouts_total", "Connection checkouts that timed out", "counter", [], _db_pool("timeouts"))
+    registry.collector(
+        "llm_breaker_open", "1 while the LLM circuit breaker routes documents to the regex backend", "gauge", [],
+        lambda: [((), 0 if breaker.state() == "closed" else 1)]
+    )
+    registry.collector(
+        "regex_rule_seconds_total", "Time spent per regex extraction rule", "counter", ["rule"],
+        lambda: [((name,), s["seconds"]) for name, s in rule_stats().items()]
+    )
@@ -0,0 +1,154 @@
+import bisect
+import threading
+
+# 📊 Minimal Prometheus-style registry (text exposition format 0.0.4), no client library needed
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _label_str(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_label_str(self.label_names, k)} {v}" for k, v in items]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += 1
+            state[2] += value
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            items = [(k, (list(s[0]), s[1], s[2])) for k, s in self._values.items()]
+        for key, (counts, count, total) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_label_str(self.label_names + ('le',), key + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_label_str(self.label_names + ('le',), key + ('+Inf',))} {count}")
+            lines.append(f"{self.name}_count{_label_str(self.label_names, key)} {count}")
+            lines.append(f"{self.name}_sum{_label_str(self.label_names, key)} {total}")
+        return lines
+
+
+class Collector:
+    # values read at scrape time from existing stats (caches, pools, ...)
+    def __init__(self, name, help, type, labels, collect):
+        self.name = name
+        self.help = help
+        self.type = type
+        self.label_names = tuple(labels)
+        self.collect = collect
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for labels, value in self.collect():
+            lines.append(f"{self.name}{_label_str(self.label_names, labels)} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def collector(self, name, help, type, labels, collect):
+        return self._register(Collector(name, help, type, labels, collect))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    "invoice_stage_seconds", "Duration of pipeline stages (upload, parse, llm, fallback, db...)", ["stage"]
+)
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_seconds", "HTTP request latency", ["method", "route", "status"]
+)
+DOCUMENTS_TOTAL = registry.counter("invoice_documents_total", "Documents processed by the pipeline", ["backend", "outcome"])
+FALLBACK_TOTAL = registry.counter("invoice_regex_fallback_total", "Documents where the regex extractor filled AI gaps")
+PARSE_EARLY_STOPS_TOTAL = registry.counter(
+    "parse_early_stops_total", "Documents whose parsing stopped once the stop fields were found", ["format"]
+)
+OCR_PAGES_TOTAL = registry.counter("ocr_pages_total", "Pages sent through OCR", ["renderer"])
+OCR_REGIONS_TOTAL = registry.counter("ocr_regions_total", "Image regions of text PDF pages sent through OCR", ["renderer"])
+OCR_ESCALATIONS_TOTAL = registry.counter(
+    "ocr_escalations_total", "Pages re-read at full resolution after a low-confidence fast pass", ["renderer"]
+)
+OCR_PAGE_SECONDS = registry.histogram("ocr_page_seconds", "OCR time per page (render + recognition)", ["renderer"])
+LLM_TOKENS_TOTAL = registry.counter("llm_tokens_total", "LLM tokens (estimated for streamed replies)", ["kind"])
+LLM_RETRIES_TOTAL = registry.counter("llm_retries_total", "Retried Azure OpenAI calls", ["reason"])
+LLM_BREAKER_ROUTED_TOTAL = registry.counter(
+    "llm_breaker_routed_total", "Documents sent to the regex backend because the LLM circuit breaker was open"
+)
+DB_STATEMENT_SECONDS = registry.histogram(
+    "db_statement_seconds", "SQL Server statement latency", ["statement"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+)
@@ -0,0 +1,62 @@
+import contextvars
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+from observability.metrics import STAGE_SECONDS
+
+# 🧭 Request-scoped structured logging and timing spans
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+logger = logging.getLogger("ai_extract")
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", None) or request_id_var.get(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging():
+    if logger.handlers:
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter())
+    logger.addHandler(handler)
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+
+
+def log(level, msg, **fields):
+    logger.log(level, msg, extra={"fields": fields})
+
+
+@contextmanager
+def span(stage, **fields):
+    started = time.perf_counter()
+    error = None
+    try:
+        yield fields
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        STAGE_SECONDS.observe(duration, stage=stage)
+        if logger.isEnabledFor(logging.DEBUG) or error:
+            log(logging.DEBUG if not error else logging.WARNING, "span", stage=stage,
+                duration_ms=round(duration * 1000, 2), error=error, **fields)
@@ -1,50 +1,135 @@
-import io
 from pathlib import Path
-import pdfplumber
-import pytesseract
-from PIL import Image
-from docx import Document
-import pandas as pd
+from typing import BinaryIO, Iterator, Union
 
-def parse_file(filename: str, content: bytes) -> str:
+from parser.layout import merge_reading_order, text_free_image_regions, text_lines
+from parser.office import Budget, iter_docx_lines, iter_xls_lines, iter_xlsx_lines
+from parser.ocr import OCR_LANG, OCR_LOOKAHEAD_PAGES, OCR_RESOLUTION, ocr_pdf_regions
+from parser.preprocess import ocr_image
+from pipeline.executors import cpu_pool, in_worker_process
+from pipeline.uploads import as_bytes, as_stream
+
+# pdfplumber, PIL, python-docx and openpyxl are imported by each parser on first use,
+# so a worker only pays for the formats it actually sees
+
+# bytes, memoryview or a seekable binary file (e.g. the spooled upload itself)
+Content = Union[bytes, memoryview, BinaryIO]
+
+# 🌊 Incremental parsing: iter_file yields page / section chunks as they are produced, so a caller can
+# look at the text so far and stop early (trailing terms-and-conditions pages are then never OCR'd).
+# parse_file is the whole document, the chunks joined.
+SECTION_LINES = 100  # DOCX / XLSX lines per chunk
+
+# lang: Tesseract language set, only used by the OCR paths (per entreprise, see Entreprise.langue_ocr)
+def iter_file(filename: str, content: Content, lang: str = None) -> Iterator[str]:
     ext = Path(filename).suffix.lower()
 
     if ext == ".pdf":
-        return parse_pdf(content)
+        return iter_pdf(content, lang)
     elif ext in {".jpg", ".jpeg", ".png", ".tiff"}:
-        return parse_image(content)
+        return iter([parse_image(content, lang)])
     elif ext in {".docx"}:
-        return parse_docx(content)
+        return _sections(iter_docx_lines(as_stream(content), Budget()))
     elif ext in {".xlsx", ".xls"}:
-        return parse_excel(content)
+        lines = iter_xls_lines if ext == ".xls" else iter_xlsx_lines
+        return _sections(lines(as_stream(content), Budget()))
     else:
-        return "Unsupported file type"
+        return iter(["Unsupported file type"])
+
+def parse_file(filename: str, content: Content, lang: str = None) -> str:
+    return "".join(iter_file(filename, content, lang))
 
-def parse_pdf(content: bytes) -> str:
-    text = ""
-    with pdfplumber.open(io.BytesIO(content)) as pdf:
-        for page in pdf.pages:
+def _sections(lines):
+    # same text as "\n".join(lines), cut every SECTION_LINES lines
+    section = []
+    first = True
+    for line in lines:
+        section.append(line)
+        if len(section) >= SECTION_LINES:
+            yield ("" if first else "\n") + "\n".join(section)
+            section, first = [], False
+    if section:
+        yield ("" if first else "\n") + "\n".join(section)
+
+# text-layer pass, PDF_TEXT_BATCH_PAGES pages per pool task: pdfplumber's layout analysis is CPU-bound too
+PDF_TEXT_BATCH_PAGES = 16
+
+def _pdf_text_pages(content, start, count):
+    # worker side -> (page count, [(page, text, image regions without text, text lines of a mixed page)])
+    import pdfplumber
+
+    pages = []
+    with pdfplumber.open(as_stream(content)) as pdf:
+        total = len(pdf.pages)
+        for n in range(start, min(start + count, total)):
+            page = pdf.pages[n]
             page_text = page.extract_text()
+            boxes, layout = [], None
             if page_text:
-                text += page_text + "\n"
-            else:
-                # fallback to OCR if no text
-                image = page.to_image(resolution=300).original
-                text += pytesseract.image_to_string(image, lang="eng+fra") + "\n"
-    return text
-
-def parse_image(content: bytes) -> str:
-    image = Image.open(io.BytesIO(content))
-    return pytesseract.image_to_string(image, lang="eng+fra")
-
-def parse_docx(content: bytes) -> str:
-    doc = Document(io.BytesIO(content))
-    return "\n".join([para.text for para in doc.paragraphs])
-
-def parse_excel(content: bytes) -> str:
-    with pd.ExcelFile(io.BytesIO(content)) as xls:
-        result = []
-        for sheet in xls.sheet_names:
-            df = xls.parse(sheet)
-            result.append(f"Sheet: {sheet}\n{df.to_string(index=False)}\n")
-        return "\n".join(result)
+                boxes = text_free_image_regions(page)
+                if boxes:
+                    layout = text_lines(page.extract_words())
+            page.flush_cache()
+            pages.append((n, page_text, boxes, layout))
+    return total, pages
+
+def _text_layer(data):
+    start, total = 0, None
+    while total is None or start < total:
+        if in_worker_process():
+            total, pages = _pdf_text_pages(data, start, PDF_TEXT_BATCH_PAGES)
+        else:
+            total, pages = cpu_pool.submit(_pdf_text_pages, data, start, PDF_TEXT_BATCH_PAGES).result()
+        yield from pages
+        start += PDF_TEXT_BATCH_PAGES
+
+def _ocr_window(data, pending, regions, lang):
+    # the window's text-less pages and image regions are OCR'd in parallel, then its pages come out in order
+    ocr_texts = ocr_pdf_regions(data, regions, lang=lang)
+    for n, page_text, layout in pending:
+        if not page_text:
+            page_text = ocr_texts.get((n, None), "")
+        elif layout is not None:
+            page_text = merge_reading_order(layout, [(bbox, text) for (m, bbox), text in ocr_texts.items() if m == n])
+        yield page_text + "\n"
+
+def iter_pdf(content: Content, lang: str = None) -> Iterator[str]:
+    lang = lang or OCR_LANG
+    # text layer and OCR both run in pool workers (other processes), which need the document as bytes
+    data = as_bytes(content)
+    pending = []  # (page, text, layout of a mixed page) from the first page needing OCR on
+    regions = []  # (page, bbox or None for the whole page) to OCR for the pending pages
+    for n, page_text, boxes, layout in _text_layer(data):
+        if not page_text:
+            # fallback to OCR if no text
+            regions.append((n, None))
+        else:
+            regions += [(n, box) for box in boxes]
+
+        if not regions:
+            # text layer only and nothing OCR'd before it: final as is
+            yield page_text + "\n"
+            continue
+        pending.append((n, page_text, layout))
+        # OCR runs at most OCR_LOOKAHEAD_PAGES pages ahead of what the caller has consumed
+        if len(pending) >= OCR_LOOKAHEAD_PAGES:
+            yield from _ocr_window(data, pending, regions, lang)
+            pending, regions = [], []
+
+    if pending:
+        yield from _ocr_window(data, pending, regions, lang)
+
+def parse_pdf(content: Content, lang: str = None) -> str:
+    return "".join(iter_pdf(content, lang))
+
+def parse_image(content: Content, lang: str = None) -> str:
+    from PIL import Image
+
+    # phone photos are often 20+ megapixels: downsampled and cleaned before Tesseract sees them
+    image = Image.open(as_stream(content))
+    return ocr_image(image, lang or OCR_LANG, OCR_RESOLUTION)
+
+def parse_docx(content: Content) -> str:
+    return "".join(iter_file(".docx", content))
+
+def parse_excel(content: Content, ext: str = ".xlsx") -> str:
+    return "".join(iter_file(ext, content))
@@ -0,0 +1,65 @@
+import os
+
+# 🧩 Mixed pages: a text layer for the body plus scanned images (stamps, headers with ICE / totals).
+# Only image regions without text under them are OCR'd, then slotted back in reading order.
+OCR_REGION_MIN_WIDTH = float(os.getenv("OCR_REGION_MIN_WIDTH", 40))  # PDF points
+OCR_REGION_MIN_HEIGHT = float(os.getenv("OCR_REGION_MIN_HEIGHT", 12))
+OCR_REGION_MIN_AREA = float(os.getenv("OCR_REGION_MIN_AREA", 3000))  # square points, skips icons and small logos
+# region text below this confidence is dropped: almost every page has a logo, and a logo reads as noise
+OCR_REGION_MIN_CONFIDENCE = float(os.getenv("OCR_REGION_MIN_CONFIDENCE", 60))
+# an image with more chars than this on top of it already has a text layer (e.g. a searchable scan)
+OCR_REGION_MAX_CHARS = int(os.getenv("OCR_REGION_MAX_CHARS", 3))
+LINE_TOLERANCE = 3
+
+
+def _overlaps(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def _merge_boxes(boxes):
+    merged = []
+    for box in sorted(boxes):
+        for i, other in enumerate(merged):
+            if _overlaps(box, other):
+                merged[i] = (min(box[0], other[0]), min(box[1], other[1]), max(box[2], other[2]), max(box[3], other[3]))
+                break
+        else:
+            merged.append(box)
+    return merged
+
+
+def text_free_image_regions(page):
+    if not page.images:
+        return []
+    px0, ptop, px1, pbottom = page.bbox
+    centres = [((c["x0"] + c["x1"]) / 2, (c["top"] + c["bottom"]) / 2) for c in page.chars]
+    boxes = []
+    for image in page.images:
+        x0, top = max(image["x0"], px0), max(image["top"], ptop)
+        x1, bottom = min(image["x1"], px1), min(image["bottom"], pbottom)
+        if x1 - x0 < OCR_REGION_MIN_WIDTH or bottom - top < OCR_REGION_MIN_HEIGHT:
+            continue
+        if (x1 - x0) * (bottom - top) < OCR_REGION_MIN_AREA:
+            continue
+        inside = sum(1 for cx, cy in centres if x0 <= cx <= x1 and top <= cy <= bottom)
+        if inside <= OCR_REGION_MAX_CHARS:
+            boxes.append((x0, top, x1, bottom))
+    return _merge_boxes(boxes)
+
+
+def text_lines(words):
+    # pdfplumber words -> [(top, x0, text)], words within LINE_TOLERANCE points share a line
+    lines = []
+    for word in sorted(words, key=lambda w: (w["top"], w["x0"])):
+        if lines and abs(word["top"] - lines[-1][0]) <= LINE_TOLERANCE:
+            lines[-1][2].append(word)
+        else:
+            lines.append([word["top"], word["x0"], [word]])
+    return [(top, x0, " ".join(w["text"] for w in sorted(ws, key=lambda w: w["x0"]))) for top, x0, ws in lines]
+
+
+def merge_reading_order(lines, region_texts):
+    # region_texts: [(bbox, text)]; each OCR'd block sits where its image starts on the page
+    blocks = list(lines) + [(bbox[1], bbox[0], text.strip()) for bbox, text in region_texts if text and text.strip()]
+    blocks.sort(key=lambda block: (block[0], block[1]))
+    return "\n".join(text for _, _, text in blocks)
@@ -0,0 +1,136 @@
+import io
+import math
+import os
+import re
+import time
+
+from observability.metrics import OCR_ESCALATIONS_TOTAL, OCR_PAGE_SECONDS, OCR_PAGES_TOTAL, OCR_REGIONS_TOTAL
+from pipeline.executors import PoolSaturated, cpu_pool, in_worker_process
+
+# ✅ Poppler location (defaults match the Windows dev setup), TESSERACT_CMD lives in parser.ocr_engine
+POPPLER_PATH = os.getenv("POPPLER_PATH", r"C:\poppler\Library\bin" if os.name == "nt" else None)
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", os.cpu_count() or 2))
+# highest DPI a page is rendered at, the fast pass uses OCR_FAST_RESOLUTION (parser.preprocess)
+OCR_RESOLUTION = int(os.getenv("OCR_RESOLUTION", 300))
+# default Tesseract languages, overridden per entreprise (Entreprise.langue_ocr)
+OCR_LANG = os.getenv("OCR_LANG", "eng+fra")
+# pages read ahead before their OCR runs: one window is OCR'd in parallel, the next only once consumed
+OCR_LOOKAHEAD_PAGES = max(1, int(os.getenv("OCR_LOOKAHEAD_PAGES", OCR_WORKERS)))
+
+_LANG_PATTERN = re.compile(r"^[A-Za-z_]{3,}(\+[A-Za-z_]{3,})*$")
+
+
+def valid_ocr_lang(lang):
+    return bool(lang and _LANG_PATTERN.match(lang))
+
+
+# 🖨️ Worker side: open the document once, render + OCR one item at a time.
+# An item is (page number, bbox): bbox None means the whole page, otherwise a region in PDF points.
+def _ocr_item(render, bbox, resolution, lang):
+    # -> (text, escalated)
+    from parser.layout import OCR_REGION_MIN_CONFIDENCE
+    from parser.preprocess import ocr_adaptive, resolution_steps
+
+    if bbox is None:
+        text, _, escalated = ocr_adaptive(render, resolution_steps(resolution), lang)
+        return text, escalated
+    # regions are small: one full-resolution pass, no escalation, and only confident text is kept
+    text, confidence, _ = ocr_adaptive(render, [resolution], lang)
+    return (text if confidence >= OCR_REGION_MIN_CONFIDENCE else ""), False
+
+
+def _ocr_pdfplumber_pages(content, items, resolution, lang):
+    import pdfplumber
+
+    results = []
+    with pdfplumber.open(io.BytesIO(content)) as pdf:
+        for n, bbox in items:
+            started = time.perf_counter()
+            page = pdf.pages[n]
+            # only the region is rasterised, not the page around it
+            target = page.crop(bbox) if bbox else page
+            text, escalated = _ocr_item(
+                lambda dpi: (target.to_image(resolution=dpi).original, dpi), bbox, resolution, lang
+            )
+            page.flush_cache()
+            results.append(((n, bbox), text, time.perf_counter() - started, escalated))
+    return results
+
+
+def _ocr_poppler_pages(content, items, resolution, lang):
+    from pdf2image import convert_from_bytes
+    from PIL import Image
+
+    def render(n, bbox, dpi):
+        # first_page/last_page are 1-based and make poppler render only this page
+        images = convert_from_bytes(content, dpi=dpi, first_page=n + 1, last_page=n + 1, poppler_path=POPPLER_PATH)
+        image = images[0] if images else Image.new("L", (1, 1), 255)
+        if bbox:
+            scale = dpi / 72
+            image = image.crop(tuple(round(v * scale) for v in bbox))
+        return image, dpi
+
+    results = []
+    for n, bbox in items:
+        started = time.perf_counter()
+        text, escalated = _ocr_item(lambda dpi: render(n, bbox, dpi), bbox, resolution, lang)
+        results.append(((n, bbox), text, time.perf_counter() - started, escalated))
+    return results
+
+
+RENDERERS = {
+    "pdfplumber": _ocr_pdfplumber_pages,
+    "poppler": _ocr_poppler_pages,
+}
+
+
+def _chunks(items, parts):
+    size = math.ceil(len(items) / parts)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+# workers hand back (item, text, seconds, escalated): metrics are recorded here, in the process that serves /metrics
+def _collect(results, renderer, texts):
+    for item, text, seconds, escalated in results:
+        texts[item] = text
+        if item[1] is None:
+            OCR_PAGES_TOTAL.inc(renderer=renderer)
+            OCR_PAGE_SECONDS.observe(seconds, renderer=renderer)
+        else:
+            OCR_REGIONS_TOTAL.inc(renderer=renderer)
+        if escalated:
+            OCR_ESCALATIONS_TOTAL.inc(renderer=renderer)
+    return texts
+
+
+# 🧵 Fan pages / regions out across the CPU pool, results keyed by (page, bbox)
+def ocr_pdf_regions(content: bytes, items, renderer="pdfplumber", resolution=OCR_RESOLUTION, lang=OCR_LANG) -> dict:
+    items = sorted(items, key=lambda item: (item[0], item[1] or ()))
+    if not items:
+        return {}
+
+    worker = RENDERERS[renderer]
+    # already inside a pool worker: no nested pools
+    if in_worker_process():
+        return _collect(worker(content, items, resolution, lang), renderer, {})
+
+    # even a single scanned page goes to the process pool: rendering and OCR never run in
+    # the API process (nor create tesserocr engines in its I/O threads)
+    futures = []
+    try:
+        for chunk in _chunks(items, max(1, min(OCR_WORKERS, len(items)))):
+            futures.append(cpu_pool.submit(worker, content, chunk, resolution, lang))
+    except PoolSaturated:
+        # the request fails with a 503: chunks already queued are not worth running
+        for future in futures:
+            future.cancel()
+        raise
+    texts = {}
+    for future in futures:
+        _collect(future.result(), renderer, texts)
+    return texts
+
+
+def ocr_pdf_pages(content: bytes, page_numbers, renderer="pdfplumber", resolution=OCR_RESOLUTION, lang=OCR_LANG) -> dict:
+    texts = ocr_pdf_regions(content, [(n, None) for n in page_numbers], renderer, resolution, lang)
+    return {n: text for (n, _), text in texts.items()}
@@ -0,0 +1,116 @@
+import os
+import threading
+from collections import namedtuple
+
+# 🔤 Long-lived OCR engines. With tesserocr (optional, binds libtesseract) each worker keeps one
+# initialised engine per language set and recognises in-memory images: no temp file, no process
+# spawn, no traineddata reload per page. Without it, pytesseract's image_to_data is the fallback.
+OCR_ENGINE = os.getenv("OCR_ENGINE", "auto")  # "auto", "tesserocr" or "pytesseract"
+TESSERACT_CMD = os.getenv(
+    "TESSERACT_CMD", r"C:\Program Files\Tesseract-OCR\tesseract.exe" if os.name == "nt" else "tesseract"
+)
+TESSDATA_PATH = os.getenv("TESSDATA_PREFIX")
+
+# words: [(text, (x0, y0, x1, y1), confidence)], confidence: mean word confidence (0-100)
+OcrResult = namedtuple("OcrResult", ["text", "words", "confidence"])
+
+
+def _mean(confidences):
+    return sum(confidences) / len(confidences) if confidences else 0.0
+
+
+class TesserocrEngine:
+    name = "tesserocr"
+
+    def __init__(self, lang):
+        from tesserocr import PyTessBaseAPI
+
+        options = {"lang": lang}
+        if TESSDATA_PATH:
+            options["path"] = TESSDATA_PATH
+        self._api = PyTessBaseAPI(**options)
+
+    def recognize(self, image):
+        from tesserocr import RIL, iterate_level
+
+        api = self._api
+        api.SetImage(image)
+        try:
+            api.Recognize()
+            words = []
+            iterator = api.GetIterator()
+            for word in iterate_level(iterator, RIL.WORD):
+                text = word.GetUTF8Text(RIL.WORD)
+                if not text or not text.strip():
+                    continue
+                words.append((text, word.BoundingBox(RIL.WORD), word.Confidence(RIL.WORD)))
+            text = api.GetUTF8Text()
+        finally:
+            # keep the loaded model, drop the page image and its results
+            api.Clear()
+        lines = [line.strip() for line in text.splitlines()]
+        return OcrResult("\n".join(line for line in lines if line), words, _mean([w[2] for w in words]))
+
+    def close(self):
+        self._api.End()
+
+
+class PytesseractEngine:
+    name = "pytesseract"
+
+    def __init__(self, lang):
+        import pytesseract
+
+        pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+        self._pytesseract = pytesseract
+        self.lang = lang
+
+    def recognize(self, image):
+        # one tesseract run gives the text (rebuilt line by line), boxes and confidences
+        pytesseract = self._pytesseract
+        data = pytesseract.image_to_data(image, lang=self.lang, output_type=pytesseract.Output.DICT)
+        lines, words = {}, []
+        for i, text in enumerate(data["text"]):
+            conf = float(data["conf"][i])
+            if conf < 0 or not text.strip():
+                continue
+            box = (data["left"][i], data["top"][i], data["left"][i] + data["width"][i], data["top"][i] + data["height"][i])
+            words.append((text, box, conf))
+            key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            lines.setdefault(key, []).append(text)
+        text = "\n".join(" ".join(line) for line in lines.values())
+        return OcrResult(text, words, _mean([w[2] for w in words]))
+
+    def close(self):
+        pass
+
+
+def _engine_class():
+    if OCR_ENGINE == "pytesseract":
+        return PytesseractEngine
+    try:
+        import tesserocr  # noqa: F401
+        return TesserocrEngine
+    except ImportError:
+        if OCR_ENGINE == "tesserocr":
+            raise
+        return PytesseractEngine
+
+
+# a libtesseract handle is not thread-safe: one engine per (thread, language set); pool workers
+# are single-threaded processes, so that is one engine per worker and language set
+_local = threading.local()
+
+
+def get_engine(lang):
+    engines = getattr(_local, "engines", None)
+    if engines is None:
+        engines = _local.engines = {}
+    engine = engines.get(lang)
+    if engine is None:
+        engine = engines[lang] = _engine_class()(lang)
+    return engine
+
+
+def recognize(image, lang):
+    return get_engine(lang).recognize(image)
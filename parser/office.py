@@ -0,0 +1,119 @@
+import os
+from datetime import date, datetime
+
+# 📑 Streaming DOCX / XLSX readers: compact row-oriented text, bounded by a row/cell budget
+OFFICE_MAX_ROWS = int(os.getenv("OFFICE_MAX_ROWS", 2000))
+OFFICE_MAX_CELLS = int(os.getenv("OFFICE_MAX_CELLS", 50000))
+# tab-separated: compact for the LLM and still whitespace for the regex row rules
+CELL_SEPARATOR = "\t"
+
+
+class Budget:
+    def __init__(self, max_rows=OFFICE_MAX_ROWS, max_cells=OFFICE_MAX_CELLS):
+        self.max_rows = max_rows
+        self.max_cells = max_cells
+        self.rows = 0
+        self.cells = 0
+
+    def take(self, cells):
+        # False once the document has used up its budget, the caller stops reading
+        if self.rows >= self.max_rows or self.cells + cells > self.max_cells:
+            return False
+        self.rows += 1
+        self.cells += cells
+        return True
+
+    def note(self):
+        return f"[truncated after {self.rows} rows / {self.cells} cells]"
+
+
+def format_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else repr(value)
+    if isinstance(value, datetime):
+        return value.date().isoformat() if value.time() == datetime.min.time() else value.isoformat(sep=" ")
+    if isinstance(value, date):
+        return value.isoformat()
+    return " ".join(str(value).split())
+
+
+def _row_text(values):
+    cells = [text for text in map(format_cell, values) if text]
+    return CELL_SEPARATOR.join(cells), len(cells)
+
+
+def iter_xlsx_lines(stream, budget):
+    from openpyxl import load_workbook
+
+    # read_only streams rows from the sheet XML instead of building the whole workbook
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            yield f"Sheet: {sheet.title}"
+            for values in sheet.iter_rows(values_only=True):
+                line, cells = _row_text(values)
+                if not cells:
+                    continue
+                if not budget.take(cells):
+                    yield budget.note()
+                    return
+                yield line
+    finally:
+        workbook.close()
+
+
+def iter_xls_lines(stream, budget):
+    # legacy .xls is not readable by openpyxl, pandas + xlrd stay for that format only
+    import pandas as pd
+
+    with pd.ExcelFile(stream) as xls:
+        for sheet in xls.sheet_names:
+            yield f"Sheet: {sheet}"
+            for values in xls.parse(sheet, header=None).itertuples(index=False):
+                line, cells = _row_text(v for v in values if v == v)  # NaN != NaN
+                if not cells:
+                    continue
+                if not budget.take(cells):
+                    yield budget.note()
+                    return
+                yield line
+
+
+def _table_lines(table):
+    for row in table.rows:
+        seen = set()
+        values = []
+        # merged cells come back once per grid column, keep each cell once
+        for cell in row.cells:
+            if id(cell._tc) in seen:
+                continue
+            seen.add(id(cell._tc))
+            values.append(cell.text)
+        yield values
+
+
+def iter_docx_lines(stream, budget):
+    from docx import Document
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+
+    document = Document(stream)
+    # body children in document order, so tables stay between the paragraphs around them
+    for child in document.element.body.iterchildren():
+        tag = child.tag.rsplit("}", 1)[-1]
+        if tag == "p":
+            rows = [[Paragraph(child, document).text]]
+        elif tag == "tbl":
+            rows = _table_lines(Table(child, document))
+        else:
+            continue
+        for values in rows:
+            line, cells = _row_text(values)
+            if not cells:
+                continue
+            if not budget.take(cells):
+                yield budget.note()
+                return
+            yield line
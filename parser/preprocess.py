@@ -0,0 +1,152 @@
+import os
+
+# 🖼️ OCR preprocessing: Tesseract time grows with pixel count, so pages are cleaned and
+# downsampled first, and only re-read at full resolution when the fast pass looks unreliable
+OCR_FAST_RESOLUTION = int(os.getenv("OCR_FAST_RESOLUTION", 150))
+OCR_MIN_CONFIDENCE = float(os.getenv("OCR_MIN_CONFIDENCE", 70))
+OCR_DESKEW_MAX_ANGLE = float(os.getenv("OCR_DESKEW_MAX_ANGLE", 5))
+OCR_CROP_MARGIN = int(os.getenv("OCR_CROP_MARGIN", 20))
+
+# photos and scans without DPI metadata are assumed to show one A4 page (long side in inches)
+A4_LONG_SIDE_INCHES = 11.69
+# phone cameras write a default 72 dpi: metadata implying a page over twice the A4 long side
+# (larger than A3) is not believed either
+MAX_PAGE_INCHES = 2 * A4_LONG_SIDE_INCHES
+
+
+def source_dpi(image):
+    dpi = image.info.get("dpi")
+    if dpi and dpi[0] and dpi[0] > 1 and max(image.size) / float(dpi[0]) <= MAX_PAGE_INCHES:
+        return float(dpi[0])
+    return max(image.size) / A4_LONG_SIDE_INCHES
+
+
+def downsample(image, dpi, target_dpi):
+    scale = target_dpi / dpi
+    if scale >= 1:
+        return image
+    from PIL import Image
+
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    return image.resize(size, Image.BILINEAR, reducing_gap=2.0)
+
+
+def otsu_threshold(gray):
+    histogram = gray.histogram()
+    total = sum(histogram)
+    weighted_total = sum(i * h for i, h in enumerate(histogram))
+    background = weighted = 0
+    best, threshold = -1.0, 128
+    for i, h in enumerate(histogram):
+        background += h
+        if background == 0:
+            continue
+        foreground = total - background
+        if foreground == 0:
+            break
+        weighted += i * h
+        mean_b = weighted / background
+        mean_f = (weighted_total - weighted) / foreground
+        variance = background * foreground * (mean_b - mean_f) ** 2
+        if variance > best:
+            best, threshold = variance, i
+    return threshold
+
+
+def binarize(gray):
+    threshold = otsu_threshold(gray)
+    return gray.point(lambda v: 255 if v > threshold else 0, mode="L")
+
+
+def _row_profile_score(thumb, angle):
+    from PIL import Image
+
+    # text lines aligned with the rows give the most contrasted row means
+    rows = list(thumb.rotate(angle, fillcolor=255).resize((1, thumb.height), Image.BOX).getdata())
+    mean = sum(rows) / len(rows)
+    return sum((r - mean) ** 2 for r in rows)
+
+
+def estimate_skew(binary):
+    if OCR_DESKEW_MAX_ANGLE <= 0:
+        return 0.0
+    thumb = binary.copy()
+    thumb.thumbnail((600, 600))
+    best_angle, best_score = 0.0, _row_profile_score(thumb, 0.0)
+    # coarse 1° sweep, then refine to 0.25° around the best candidate
+    for step, span in ((1.0, OCR_DESKEW_MAX_ANGLE), (0.25, 1.0)):
+        center = best_angle
+        angle = center - span
+        while angle <= center + span:
+            if angle != center:
+                score = _row_profile_score(thumb, angle)
+                if score > best_score:
+                    best_angle, best_score = angle, score
+            angle += step
+    return best_angle
+
+
+def crop_margins(binary):
+    from PIL import ImageOps
+
+    bbox = ImageOps.invert(binary).getbbox()
+    if bbox is None:
+        return None
+    left, top, right, bottom = bbox
+    m = OCR_CROP_MARGIN
+    return binary.crop((max(0, left - m), max(0, top - m), min(binary.width, right + m), min(binary.height, bottom + m)))
+
+
+# grayscale -> downsample -> binarise -> deskew -> crop, None for a blank page
+def prepare(image, dpi, target_dpi):
+    from PIL import Image, ImageOps
+
+    gray = ImageOps.exif_transpose(image).convert("L")
+    binary = binarize(downsample(gray, dpi, target_dpi))
+    angle = estimate_skew(binary)
+    if abs(angle) >= 0.25:
+        binary = binary.rotate(angle, resample=Image.BILINEAR, expand=True, fillcolor=255)
+        binary = binarize(binary)
+    return crop_margins(binary)
+
+
+def recognise(image, lang):
+    from parser.ocr_engine import recognize
+
+    result = recognize(image, lang)
+    return result.text, result.confidence
+
+
+# render(dpi) -> (image, dpi of that image); returns (text, confidence, escalated)
+def ocr_adaptive(render, resolutions, lang):
+    best = ("", -1.0)
+    attempts = 0
+    previous = None
+    for target in resolutions:
+        image, dpi = render(target)
+        # a source below the target is never upsampled: a step giving the same pixels is not worth a re-read
+        pixels = (image.size, min(target, dpi))
+        if pixels == previous:
+            break
+        previous = pixels
+        attempts += 1
+        prepared = prepare(image, dpi, target)
+        if prepared is None:
+            return "", 100.0, False
+        text, confidence = recognise(prepared, lang)
+        if confidence > best[1]:
+            best = (text, confidence)
+        if confidence >= OCR_MIN_CONFIDENCE:
+            break
+    return best[0], best[1], attempts > 1
+
+
+def resolution_steps(max_resolution):
+    return sorted({min(OCR_FAST_RESOLUTION, max_resolution), max_resolution})
+
+
+def ocr_image(image, lang, max_resolution):
+    dpi = source_dpi(image)
+    # every pass starts from the original pixels, never from an already downsampled copy
+    text, _, _ = ocr_adaptive(lambda target: (image, dpi), resolution_steps(max_resolution), lang)
+    return text
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+# 🗄️ Content-addressed on-disk cache (parsed text + LLM output)
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 512 * 1024 * 1024))
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", 7 * 24 * 3600))
+
+
+def sha256_hex(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class DiskCache:
+    def __init__(self, name, directory, max_bytes, ttl):
+        self.name = name
+        self.directory = Path(directory) / name
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = None  # key -> size in bytes, least recently used first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key):
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _load_index(self):
+        # built lazily from the files on disk, ordered by last access (mtime is touched on hit)
+        if self._entries is not None:
+            return
+        files = sorted(self.directory.glob("*/*.json"), key=lambda p: p.stat().st_mtime) if self.directory.exists() else []
+        self._entries = OrderedDict()
+        for path in files:
+            size = path.stat().st_size
+            self._entries[path.stem] = size
+            self._total_bytes += size
+
+    def _discard(self, key):
+        size = self._entries.pop(key, 0)
+        self._total_bytes -= size
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def get(self, key):
+        with self._lock:
+            self._load_index()
+            path = self._path(key)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (FileNotFoundError, ValueError):
+                self._discard(key)
+                self.misses += 1
+                return None
+
+            if time.time() - entry["created_at"] > self.ttl:
+                self._discard(key)
+                self.misses += 1
+                return None
+
+            if key not in self._entries:
+                # written by another worker process
+                size = path.stat().st_size
+                self._entries[key] = size
+                self._total_bytes += size
+            self._entries.move_to_end(key)
+            os.utime(path)
+            self.hits += 1
+            return entry["value"]
+
+    def set(self, key, value):
+        data = json.dumps({"created_at": time.time(), "value": value}, default=str).encode("utf-8")
+        with self._lock:
+            self._load_index()
+            path = self._path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+            self._total_bytes -= self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries or ()),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+text_cache = DiskCache("text", CACHE_DIR, CACHE_MAX_BYTES // 2, CACHE_TTL_SECONDS)
+llm_cache = DiskCache("llm", CACHE_DIR, CACHE_MAX_BYTES // 2, CACHE_TTL_SECONDS)
+
+
+def cache_stats():
+    return {"text": text_cache.stats(), "llm": llm_cache.stats()}
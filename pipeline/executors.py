@@ -0,0 +1,153 @@
+import asyncio
+import contextvars
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+
+# ⚙️ Pool sizing (CPU-bound: OCR / pdfplumber, I/O-bound: LLM / SQL Server)
+CPU_POOL_SIZE = int(os.getenv("CPU_POOL_SIZE", os.cpu_count() or 2))
+CPU_QUEUE_LIMIT = int(os.getenv("CPU_QUEUE_LIMIT", CPU_POOL_SIZE * 4))
+IO_POOL_SIZE = int(os.getenv("IO_POOL_SIZE", 32))
+IO_QUEUE_LIMIT = int(os.getenv("IO_QUEUE_LIMIT", 256))
+
+
+# set by the CPU pool's initializer: True only inside its worker processes (uvicorn --reload / --workers
+# children have a parent process too, so multiprocessing.parent_process() cannot tell them apart)
+_IN_POOL_WORKER = False
+
+
+def _mark_pool_worker():
+    global _IN_POOL_WORKER
+    _IN_POOL_WORKER = True
+
+
+def in_worker_process():
+    return _IN_POOL_WORKER
+
+
+@contextmanager
+def cpu_inline():
+    # single-threaded tools only (bench/run.py): CPU sub-tasks run in the calling process as they would
+    # inside a pool worker, so tracemalloc sees their allocations
+    global _IN_POOL_WORKER
+    previous, _IN_POOL_WORKER = _IN_POOL_WORKER, True
+    try:
+        yield
+    finally:
+        _IN_POOL_WORKER = previous
+
+
+class PoolSaturated(Exception):
+    def __init__(self, pool_name):
+        super().__init__(f"{pool_name} pool saturated, retry later")
+        self.pool_name = pool_name
+
+
+class BoundedPool:
+    def __init__(self, name, factory, size, queue_limit, copy_context=False):
+        self.name = name
+        self.copy_context = copy_context
+        self.size = size
+        self.queue_limit = queue_limit
+        self._factory = factory
+        self._executor = None
+        self._inflight = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._factory(self.size)
+            return self._executor
+
+    def _acquire(self):
+        with self._lock:
+            if self._inflight >= self.size + self.queue_limit:
+                self._rejected += 1
+                raise PoolSaturated(self.name)
+            self._inflight += 1
+
+    def _release(self):
+        with self._lock:
+            self._inflight -= 1
+
+    async def run(self, fn, *args, **kwargs):
+        self._acquire()
+        try:
+            loop = asyncio.get_running_loop()
+            call = partial(fn, *args, **kwargs)
+            if self.copy_context:
+                # threads see the caller's request id; process workers cannot receive a Context
+                call = partial(contextvars.copy_context().run, call)
+            return await loop.run_in_executor(self.executor, call)
+        finally:
+            self._release()
+
+    # Sub-tasks submitted from other threads (PDF text batches, OCR windows) go through the same
+    # queue-depth check and count as in flight until their future completes
+    def submit(self, fn, *args, **kwargs):
+        self._acquire()
+        try:
+            future = self.executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "queue_limit": self.queue_limit,
+                "inflight": self._inflight,
+                "queued": max(0, self._inflight - self.size),
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+# workers are started by a clean forkserver (spawn where fork is unavailable), never forked from the API
+# process: its event loop, I/O threads and DB pool locks would be copied mid-flight and can deadlock
+CPU_POOL_START_METHOD = os.getenv(
+    "CPU_POOL_START_METHOD", "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+cpu_pool = BoundedPool(
+    "cpu",
+    lambda n: ProcessPoolExecutor(
+        max_workers=n, mp_context=multiprocessing.get_context(CPU_POOL_START_METHOD), initializer=_mark_pool_worker
+    ),
+    CPU_POOL_SIZE, CPU_QUEUE_LIMIT
+)
+io_pool = BoundedPool(
+    "io", lambda n: ThreadPoolExecutor(max_workers=n, thread_name_prefix="io"), IO_POOL_SIZE, IO_QUEUE_LIMIT,
+    copy_context=True
+)
+
+
+async def run_cpu(fn, *args, **kwargs):
+    return await cpu_pool.run(fn, *args, **kwargs)
+
+
+async def run_io(fn, *args, **kwargs):
+    return await io_pool.run(fn, *args, **kwargs)
+
+
+def pool_stats():
+    return {"cpu": cpu_pool.stats(), "io": io_pool.stats()}
+
+
+def shutdown_pools(wait=True):
+    cpu_pool.shutdown(wait=wait)
+    io_pool.shutdown(wait=wait)
@@ -0,0 +1,282 @@
+import logging
+import re
+from datetime import datetime
+from pathlib import Path
+
+from db.entreprise import get_entreprise_by_id
+from db.facture import find_duplicate_facture
+from db.insert_facture import insert_facture
+from extractor.ai_extractor import PROMPT_VERSION, clean_products
+from extractor.backends import get_backend
+from extractor.client_context import client_fields, strip_client_identifiers
+from extractor.extractor_router import PARSE_EARLY_STOP, PARSE_STOP_FIELDS, extract_entities_timed, parse_until_found
+from extractor.llm_client import breaker, llm_slot
+from extractor.numbers import amount_issues
+from extractor.rule_engine import record_timings
+from observability.metrics import (
+    DOCUMENTS_TOTAL, FALLBACK_TOTAL, LLM_BREAKER_ROUTED_TOTAL, LLM_TOKENS_TOTAL, PARSE_EARLY_STOPS_TOTAL
+)
+from observability.tracing import log, span
+from parser.file_router import parse_file
+from parser.ocr import OCR_LANG
+from pipeline.cache import llm_cache, sha256_hex, text_cache
+from pipeline.executors import run_cpu, run_io
+from pipeline.uploads import as_bytes, content_digest
+
+REQUIRED_KEYS = [
+    "invoice_number", "invoice_date", "fournisseur_name", "fournisseur_address",
+    "fournisseur_ice", "fournisseur_cnss", "fournisseur_if",
+    "total_ht", "vat_amount", "total_ttc", "currency"
+]
+
+
+INVOICE_NUMBER_RE = re.compile(r"(Facture|Invoice)[^\d]{0,5}(\d{2,}/\d{2,}|\d+)", re.IGNORECASE)
+INVOICE_DATE_RE = re.compile(r"(\d{2}/\d{2}/\d{4})|(\d{4}-\d{2}-\d{2})")
+
+
+def invoice_number_from_text(text):
+    match = INVOICE_NUMBER_RE.search(text)
+    return match.group(2) if match else None
+
+
+def invoice_date_from_text(text):
+    match = INVOICE_DATE_RE.search(text)
+    return match.group(0) if match else None
+
+
+def missing_keys(entities):
+    missing = []
+    for k in REQUIRED_KEYS:
+        val = entities.get(k)
+        if val is None or str(val).strip() in ["", "null"]:
+            missing.append(k)
+    return missing
+
+
+# 🧩 Field-level merge: the regex extractor only fills what the AI left empty
+def merge_entities(ai_entities, fallback, missing):
+    if ai_entities.get("error"):
+        return fallback
+    merged = dict(ai_entities)
+    for k in missing:
+        if fallback.get(k) not in (None, ""):
+            merged[k] = fallback[k]
+    if not merged.get("products") and fallback.get("products"):
+        merged["products"] = fallback["products"]
+    return merged
+
+
+class InvoiceError(Exception):
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+def safe_date(date_str):
+    if not date_str:
+        return None
+    date_str = str(date_str).strip()
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%d-%m-%Y"):
+        try:
+            dt = datetime.strptime(date_str, fmt)
+            return dt.date()
+        except:
+            continue
+    return None
+
+
+def text_cache_key(filename, digest, lang=OCR_LANG):
+    # the OCR language and the early-stop policy change the extracted text, so they are part of the key
+    stop = ",".join(PARSE_STOP_FIELDS) if PARSE_EARLY_STOP else ""
+    return sha256_hex(Path(filename).suffix.lower(), digest, lang, stop)
+
+
+def llm_cache_key(text, entreprise):
+    fields = client_fields(entreprise)
+    return sha256_hex(PROMPT_VERSION, text, *fields)
+
+
+def _parse_whole(filename, content, lang=None):
+    return parse_file(filename, content, lang), False
+
+
+def _lookup(cache, key_fn, *args):
+    key = key_fn(*args)
+    return key, cache.get(key)
+
+
+async def parse_document(filename: str, content, cache_info=None, digest=None, lang=None) -> str:
+    lang = lang or OCR_LANG
+    if digest is None:
+        digest = await run_io(content_digest, content)
+    key, text = await run_io(_lookup, text_cache, text_cache_key, filename, digest, lang)
+    if cache_info is not None:
+        cache_info["text"] = text is not None
+    if text is not None:
+        return text
+
+    extension = Path(filename).suffix.lower()
+    # chunks are consumed where they are produced (generators cannot leave the worker): stop once
+    # supplier ICE, numero and totals are known, later pages are never parsed / OCR'd
+    parse = parse_until_found if PARSE_EARLY_STOP else _parse_whole
+    with span("parse", format=extension):
+        if extension == ".pdf":
+            # parse_pdf only coordinates here: its text-layer batches and OCR windows run in the process pool
+            text, stopped = await run_io(parse, filename, content, lang)
+        else:
+            # process workers need the raw bytes, file objects cannot cross the process boundary
+            if hasattr(content, "read"):
+                content = await run_io(as_bytes, content)
+            text, stopped = await run_cpu(parse, filename, content, lang)
+    if stopped:
+        PARSE_EARLY_STOPS_TOTAL.inc(format=extension)
+    await run_io(text_cache.set, key, text)
+    return text
+
+
+async def extract_entities_cached(text: str, entreprise: dict, cache_info=None, backend=None):
+    if backend.cacheable:
+        key, entities = await run_io(_lookup, llm_cache, llm_cache_key, text, entreprise)
+        if cache_info is not None:
+            cache_info["llm"] = entities is not None
+        if entities is not None:
+            return entities, None
+
+    run = run_cpu if backend.cpu_bound else run_io
+    with span("llm", backend=backend.name) as fields:
+        if backend.rate_limited:
+            async with llm_slot():
+                entities = await run(backend.extract, text, entreprise)
+        else:
+            entities = await run(backend.extract, text, entreprise)
+        token_usage = entities.pop("token_usage", None)
+        for kind in ("prompt_tokens", "completion_tokens"):
+            if token_usage and token_usage.get(kind):
+                LLM_TOKENS_TOTAL.inc(token_usage[kind], kind=kind.split("_")[0])
+        fields["tokens"] = token_usage
+    record_timings(entities.pop("rule_timings", {}))
+    # failed calls are not cached so the next retry really hits Azure again
+    if backend.cacheable and not entities.get("error"):
+        await run_io(llm_cache.set, key, entities)
+    return entities, token_usage
+
+
+# 🔁 Full pipeline: parse -> AI (or regex fallback) -> DB insert
+async def process_invoice(filename: str, content, entreprise_id: int, digest=None, backend=None) -> dict:
+    try:
+        backend = get_backend(backend)
+    except ValueError as e:
+        raise InvoiceError(400, str(e))
+    if backend.rate_limited and not breaker.allow():
+        # Azure keeps failing: answer from the regex extractor instead of queueing more doomed calls
+        LLM_BREAKER_ROUTED_TOTAL.inc()
+        backend = get_backend("regex")
+
+    # CPU-bound parsing/OCR goes to the process pool, LLM and SQL Server calls to the thread pool
+    # the entreprise is needed first: it picks the OCR language, and an invalid id skips parsing entirely
+    local_entreprise = await run_io(get_entreprise_by_id, entreprise_id)
+    if not local_entreprise:
+        raise InvoiceError(400, "Invalid entreprise_id")
+
+    cache_info = {"text": False, "llm": False}
+    text = await parse_document(filename, content, cache_info, digest, local_entreprise.get("langue_ocr"))
+
+    # the client's own ICE / IF / CNSS are masked before any extractor sees the text
+    text = strip_client_identifiers(text, local_entreprise)
+
+    # 🔁 cheap regex pass first: a re-submitted invoice (same supplier ICE + numero + date) costs one
+    # indexed lookup and never reaches the LLM; otherwise the result is reused as the fallback below
+    with span("duplicate_check"):
+        prefetch, rule_timings = await run_cpu(extract_entities_timed, text)
+        record_timings(rule_timings)
+        # only the full unique key short-circuits: ICE + numero + a parsed date (same fallbacks as the insert)
+        ice = prefetch.get("fournisseur_ice")
+        numero = prefetch.get("invoice_number") or invoice_number_from_text(text)
+        invoice_date = safe_date(prefetch.get("invoice_date")) or safe_date(invoice_date_from_text(text))
+        existing_id = None
+        if ice and numero and invoice_date:
+            existing_id = await run_io(find_duplicate_facture, ice, numero, invoice_date)
+    if existing_id is not None:
+        log(logging.INFO, "🔁 Facture déjà enregistrée", facture_id=existing_id)
+        DOCUMENTS_TOTAL.inc(backend=backend.name, outcome="duplicate")
+        return {
+            "text_preview": text[:1000],
+            "entities": prefetch,
+            "facture_id": existing_id,
+            "duplicate": True,
+            "backend": backend.name,
+            "cache": cache_info,
+            "tokens": None
+        }
+
+    if backend.rule_based:
+        # the regex backend's result is the duplicate-check pass above: the rules are not run twice
+        ai_entities, token_usage = backend.from_rules(prefetch), None
+    else:
+        ai_entities, token_usage = await extract_entities_cached(text, local_entreprise, cache_info, backend)
+
+    missing = missing_keys(ai_entities)
+    if missing and backend.needs_fallback:
+        log(logging.WARNING, "⚠️ Missing keys from AI", missing=missing)
+        FALLBACK_TOTAL.inc()
+        ai_entities = merge_entities(ai_entities, prefetch, missing)
+
+    facture_id = None
+    created = True
+    checks = []
+    if isinstance(ai_entities, dict) and not ai_entities.get("error"):
+        if not ai_entities.get("invoice_number"):
+            found_number = invoice_number_from_text(text)
+            if found_number:
+                ai_entities["invoice_number"] = found_number
+                log(logging.INFO, "✅ Numéro de facture récupéré depuis le texte", invoice_number=found_number)
+
+        if not ai_entities.get("invoice_date") and not ai_entities.get("date"):
+            found_date = invoice_date_from_text(text)
+            if found_date:
+                ai_entities["invoice_date"] = found_date
+                log(logging.INFO, "✅ Date récupérée par fallback regex", invoice_date=found_date)
+
+        date_valide = ai_entities.get("invoice_date") or ai_entities.get("date")
+        if not date_valide:
+            DOCUMENTS_TOTAL.inc(backend=backend.name, outcome="rejected")
+            raise InvoiceError(400, "Date manquante ou invalide dans les données extraites.")
+
+        products = clean_products(ai_entities.get("products", []))
+        total_ht = ai_entities.get("total_ht") or ai_entities.get("montant_ht")
+        vat_amount = ai_entities.get("vat_amount") or ai_entities.get("tva")
+        total_ttc = ai_entities.get("total_ttc") or ai_entities.get("montant_ttc")
+        # reported, not blocking: a mismatch usually points at a misread amount worth a manual look
+        checks = amount_issues(products, total_ht, vat_amount, total_ttc)
+        if checks:
+            log(logging.WARNING, "⚖️ Montants incohérents", checks=checks)
+
+        with span("db_insert"):
+            # created is False when the unique index already held this invoice (e.g. a concurrent upload)
+            facture_id, created = await run_io(insert_facture, {
+                "numero": ai_entities.get("invoice_number") or ai_entities.get("numero"),
+                "date": safe_date(date_valide),
+                "fournisseur_name": ai_entities.get("fournisseur_name") or ai_entities.get("fournisseur"),
+                "fournisseur_address": ai_entities.get("fournisseur_address") or ai_entities.get("adresse"),
+                "fournisseur_ice": ai_entities.get("fournisseur_ice") or ai_entities.get("ice"),
+                "fournisseur_cnss": ai_entities.get("fournisseur_cnss") or ai_entities.get("cnss"),
+                "fournisseur_if": ai_entities.get("fournisseur_if") or ai_entities.get("if"),
+                "total_ht": total_ht,
+                "vat_amount": vat_amount,
+                "total_ttc": total_ttc,
+                "products": products
+            })
+
+    outcome = "error" if ai_entities.get("error") else "extracted" if created else "duplicate"
+    DOCUMENTS_TOTAL.inc(backend=backend.name, outcome=outcome)
+    return {
+        "text_preview": text[:1000],
+        "entities": ai_entities,
+        "facture_id": facture_id,
+        "duplicate": not created,
+        "checks": checks,
+        "backend": backend.name,
+        "cache": cache_info,
+        "tokens": token_usage
+    }
@@ -0,0 +1,285 @@
+import asyncio
+import io
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+import zipfile
+import zlib
+from pathlib import Path
+
+from observability.tracing import log, request_id_var
+from pipeline.executors import PoolSaturated, run_io
+from pipeline.invoice import InvoiceError, process_invoice
+from pipeline.uploads import MAX_BATCH_UPLOAD_BYTES, MAX_UPLOAD_BYTES, UploadTooLarge
+
+# 📬 Persistent local job queue (SQLite) for batch extraction
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", 600))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", 2))
+
+SUPPORTED_EXTENSIONS = {".pdf", ".jpg", ".jpeg", ".png", ".tiff", ".docx", ".xlsx", ".xls"}
+
+
+class InvalidArchive(Exception):
+    def __init__(self, filename):
+        super().__init__(f"{filename}: corrupt or truncated zip archive")
+        self.filename = filename
+
+
+_loop = None
+_wakeup = None
+_workers = []
+
+
+def _connect():
+    conn = sqlite3.connect(JOBS_DB_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def create_jobs_table():
+    conn = _connect()
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        batch_id TEXT NOT NULL,
+        entreprise_id INTEGER NOT NULL,
+        filename TEXT NOT NULL,
+        content BLOB,
+        status TEXT NOT NULL DEFAULT 'queued',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        result TEXT,
+        error TEXT,
+        locked_until REAL,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    """)
+    if "backend" not in [row["name"] for row in conn.execute("PRAGMA table_info(jobs)")]:
+        conn.execute("ALTER TABLE jobs ADD COLUMN backend TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs (status, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_batch ON jobs (batch_id)")
+    conn.close()
+
+
+def _read_member(archive, member, limit):
+    # the size in the zip header is not trusted: at most limit + 1 bytes are inflated
+    with archive.open(member) as stream:
+        data = stream.read(limit + 1)
+    return data if len(data) <= limit else None
+
+
+# 🗜️ (filename, bytes) pairs -> job documents, .zip archives are unpacked.
+# Each document keeps the single-upload limit and the expanded batch the batch limit (zip bombs).
+def expand_uploads(files):
+    documents = []
+    total = 0
+    for filename, content in files:
+        if Path(filename).suffix.lower() == ".zip":
+            try:
+                with zipfile.ZipFile(io.BytesIO(content)) as archive:
+                    for member in archive.infolist():
+                        if member.is_dir() or Path(member.filename).suffix.lower() not in SUPPORTED_EXTENSIONS:
+                            continue
+                        data = None
+                        if member.file_size <= MAX_UPLOAD_BYTES:
+                            data = _read_member(archive, member, MAX_UPLOAD_BYTES)
+                        if data is None:
+                            log(logging.WARNING, "⚠️ Oversized archive member skipped", archive=filename, member=member.filename)
+                            continue
+                        total += len(data)
+                        if total > MAX_BATCH_UPLOAD_BYTES:
+                            raise UploadTooLarge(MAX_BATCH_UPLOAD_BYTES)
+                        documents.append((Path(member.filename).name, data))
+            except (zipfile.BadZipFile, zlib.error, EOFError):
+                # damaged central directory or member data (bad CRC, truncated stream): the batch is refused
+                raise InvalidArchive(filename)
+        else:
+            total += len(content)
+            if total > MAX_BATCH_UPLOAD_BYTES:
+                raise UploadTooLarge(MAX_BATCH_UPLOAD_BYTES)
+            documents.append((filename, content))
+    return documents
+
+
+def enqueue_batch(entreprise_id, documents, backend=None):
+    batch_id = uuid.uuid4().hex
+    now = time.time()
+    jobs = [(uuid.uuid4().hex, filename, content) for filename, content in documents]
+
+    conn = _connect()
+    try:
+        conn.execute("BEGIN")
+        conn.executemany("""
+            INSERT INTO jobs (id, batch_id, entreprise_id, filename, content, backend, status, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, 'queued', ?, ?)
+        """, [(job_id, batch_id, entreprise_id, filename, content, backend, now, now) for job_id, filename, content in jobs])
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    # called from the I/O pool, so the asyncio.Event is poked through its loop
+    if _wakeup is not None:
+        _loop.call_soon_threadsafe(_wakeup.set)
+    return batch_id, [{"id": job_id, "filename": filename} for job_id, filename, _ in jobs]
+
+
+def claim_job():
+    now = time.time()
+    conn = _connect()
+    try:
+        # BEGIN IMMEDIATE takes the write lock so two uvicorn workers never claim the same job
+        conn.execute("BEGIN IMMEDIATE")
+        # every claim counts as an attempt: a document whose lease keeps expiring (it crashes or hangs
+        # its worker) is given up instead of being re-leased forever
+        abandoned = conn.execute("""
+            UPDATE jobs SET status = 'failed', error = ?, content = NULL, locked_until = NULL, updated_at = ?
+            WHERE status = 'running' AND locked_until < ? AND attempts >= ?
+        """, (
+            f"Abandoned after {JOB_MAX_ATTEMPTS} attempts: the worker never finished it", now, now, JOB_MAX_ATTEMPTS
+        )).rowcount
+        if abandoned:
+            log(logging.WARNING, "⚠️ Jobs abandoned after repeated lease expiry", jobs=abandoned)
+        row = conn.execute("""
+            SELECT id, entreprise_id, filename, content, backend, attempts FROM jobs
+            WHERE status = 'queued' OR (status = 'running' AND locked_until < ?)
+            ORDER BY created_at
+            LIMIT 1
+        """, (now,)).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        conn.execute("""
+            UPDATE jobs SET status = 'running', attempts = attempts + 1, locked_until = ?, updated_at = ?
+            WHERE id = ?
+        """, (now + JOB_LEASE_SECONDS, now, row["id"]))
+        conn.execute("COMMIT")
+        return dict(row)
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def finish_job(job_id, status, result=None, error=None):
+    conn = _connect()
+    try:
+        # the payload is dropped once the job is final so the queue file stays small
+        conn.execute("""
+            UPDATE jobs SET status = ?, result = ?, error = ?, content = CASE WHEN ? IN ('done', 'failed') THEN NULL ELSE content END,
+                locked_until = NULL, updated_at = ?
+            WHERE id = ?
+        """, (status, json.dumps(result, default=str) if result is not None else None, error, status, time.time(), job_id))
+    finally:
+        conn.close()
+
+
+def requeue_job(job_id):
+    conn = _connect()
+    try:
+        conn.execute("""
+            UPDATE jobs SET status = 'queued', attempts = attempts - 1, locked_until = NULL, updated_at = ?
+            WHERE id = ?
+        """, (time.time(), job_id))
+    finally:
+        conn.close()
+
+
+def get_job(job_id):
+    conn = _connect()
+    try:
+        row = conn.execute("""
+            SELECT id, batch_id, entreprise_id, filename, backend, status, attempts, result, error, created_at, updated_at
+            FROM jobs WHERE id = ?
+        """, (job_id,)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    job = dict(row)
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+def get_batch_progress(batch_id):
+    conn = _connect()
+    try:
+        rows = conn.execute("SELECT status, COUNT(*) FROM jobs WHERE batch_id = ? GROUP BY status", (batch_id,)).fetchall()
+    finally:
+        conn.close()
+    counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+    for status, count in rows:
+        counts[status] = count
+    total = sum(counts.values())
+    return {
+        "batch_id": batch_id,
+        "total": total,
+        **counts,
+        "finished": total > 0 and counts["done"] + counts["failed"] == total
+    }
+
+
+async def _run_job(job):
+    # log lines of a batch document are correlated by job id
+    request_id_var.set(job["id"])
+    try:
+        result = await process_invoice(job["filename"], job["content"], job["entreprise_id"], backend=job["backend"])
+        await run_io(finish_job, job["id"], "done", result=result)
+    except InvoiceError as e:
+        await run_io(finish_job, job["id"], "failed", error=e.message)
+    except PoolSaturated:
+        # back-pressure from /extract traffic: put the job back without burning an attempt
+        await run_io(requeue_job, job["id"])
+        await asyncio.sleep(JOB_POLL_SECONDS)
+    except Exception as e:
+        status = "failed" if job["attempts"] + 1 >= JOB_MAX_ATTEMPTS else "queued"
+        await run_io(finish_job, job["id"], status, error=str(e))
+
+
+async def _worker_loop():
+    while True:
+        try:
+            job = await run_io(claim_job)
+        except PoolSaturated:
+            job = None
+        except Exception as e:
+            log(logging.ERROR, "❌ Job queue error", error=str(e))
+            job = None
+        if job is None:
+            _wakeup.clear()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        try:
+            await _run_job(job)
+        except Exception as e:
+            # the lease expires and another worker picks the job up again
+            log(logging.ERROR, "❌ Job could not be finalised", job_id=job["id"], error=str(e))
+
+
+def start_workers():
+    global _loop, _wakeup
+    create_jobs_table()
+    _loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+    for _ in range(JOB_WORKERS):
+        _workers.append(asyncio.create_task(_worker_loop()))
+
+
+async def stop_workers():
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
@@ -0,0 +1,52 @@
+import hashlib
+import io
+import os
+
+# 📤 Upload limits (the multipart parser already spools large bodies to disk)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 25 * 1024 * 1024))
+MAX_BATCH_UPLOAD_BYTES = int(os.getenv("MAX_BATCH_UPLOAD_BYTES", 1024 * 1024 * 1024))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", 1024 * 1024))
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, limit=MAX_UPLOAD_BYTES):
+        super().__init__(f"File exceeds the {limit // (1024 * 1024)} MB upload limit")
+
+
+# One pass over the spooled upload: size check + SHA-256, then rewind for the parsers
+def measure_upload(file, limit=MAX_UPLOAD_BYTES):
+    digest = hashlib.sha256()
+    size = 0
+    file.seek(0)
+    while True:
+        chunk = file.read(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > limit:
+            raise UploadTooLarge(limit)
+        digest.update(chunk)
+    file.seek(0)
+    return size, digest.hexdigest()
+
+
+def content_digest(content):
+    if hasattr(content, "read"):
+        return measure_upload(content)[1]
+    return hashlib.sha256(content).hexdigest()
+
+
+def as_stream(content):
+    if hasattr(content, "read"):
+        content.seek(0)
+        return content
+    return io.BytesIO(content)
+
+
+def as_bytes(content):
+    if hasattr(content, "read"):
+        content.seek(0)
+        data = content.read()
+        content.seek(0)
+        return data
+    return bytes(content) if isinstance(content, memoryview) else content
@@ -13,5 +13,8 @@ Write-Host "AZURE_OPENAI_ENDPOINT=$env:AZURE_OPENAI_ENDPOINT"
 Write-Host "AZURE_OPENAI_DEPLOYMENT=$env:AZURE_OPENAI_DEPLOYMENT"
 Write-Host "AZURE_OPENAI_API_VERSION=$env:AZURE_OPENAI_API_VERSION"
 
+# Apply schema changes (startup only verifies the schema)
+python -m db.migrations
+
 # Start uvicorn
 uvicorn main:app --reload
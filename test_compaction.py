@@ -0,0 +1,33 @@
+import sys
+
+from bench.synthetic import invoice_lines
+from extractor.compaction import compact_text
+from parser.office import CELL_SEPARATOR
+
+# ✂️ Compaction must never drop line items: the LLM only sees what compact_text keeps
+LINE_ITEMS = 300
+
+
+def dropped_items(separator=" "):
+    lines, products = invoice_lines(LINE_ITEMS)
+    # PDF / DOCX text is space-separated, XLSX rows come out tab-separated
+    text = "\n".join(line.replace(" ", separator) if line.startswith("Article") else line for line in lines)
+    kept = compact_text(text)
+    return [p["designation"] for p in products if p["designation"] not in kept]
+
+
+def test_every_line_item_kept():
+    assert dropped_items(" ") == []
+
+
+def test_every_tab_separated_line_item_kept():
+    assert dropped_items(CELL_SEPARATOR) == []
+
+
+if __name__ == "__main__":
+    failed = False
+    for name, separator in (("space", " "), ("tab", CELL_SEPARATOR)):
+        dropped = dropped_items(separator)
+        print(f"{'❌' if dropped else '✅'} {name}-separated: {LINE_ITEMS - len(dropped)}/{LINE_ITEMS} line items kept")
+        failed = failed or bool(dropped)
+    sys.exit(1 if failed else 0)
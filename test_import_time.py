@@ -0,0 +1,52 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# ⏱️ Import-time budget: `import main` is what every uvicorn (re)load and new worker pays
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", 2.0))
+RUNS = 3
+
+# parsers and SDKs that must only load on first use
+HEAVY_MODULES = [
+    "pdfplumber", "pdf2image", "pytesseract", "PIL", "docx", "openpyxl",
+    "pandas", "numpy", "openai", "tiktoken", "spacy", "tesserocr",
+]
+
+PROBE = (
+    "import json, sys, time\n"
+    "started = time.perf_counter()\n"
+    "import main\n"
+    "seconds = time.perf_counter() - started\n"
+    f"heavy = {HEAVY_MODULES!r}\n"
+    "print(json.dumps({'seconds': seconds, 'loaded': [m for m in heavy if m in sys.modules]}))\n"
+)
+
+
+def measure_import():
+    # fresh interpreter each time, nothing is already cached in sys.modules
+    results = []
+    for _ in range(RUNS):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE], cwd=Path(__file__).resolve().parent,
+            capture_output=True, text=True, check=True
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return min(results, key=lambda r: r["seconds"])
+
+
+def test_import_budget():
+    result = measure_import()
+    assert not result["loaded"], f"eagerly imported: {result['loaded']}"
+    assert result["seconds"] <= IMPORT_BUDGET_SECONDS, f"import main took {result['seconds']:.2f}s"
+
+
+if __name__ == "__main__":
+    result = measure_import()
+    print(f"⏱️ import main: {result['seconds'] * 1000:.0f} ms (budget {IMPORT_BUDGET_SECONDS * 1000:.0f} ms)")
+    if result["loaded"]:
+        print(f"❌ Heavy modules loaded at import: {', '.join(result['loaded'])}")
+    ok = not result["loaded"] and result["seconds"] <= IMPORT_BUDGET_SECONDS
+    print("✅ Within budget" if ok else "❌ Over budget")
+    sys.exit(0 if ok else 1)
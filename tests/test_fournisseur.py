@@ -0,0 +1,88 @@
+import sqlite3
+
+import pytest
+
+pyodbc = pytest.importorskip("pyodbc")
+
+from db import fournisseur  # noqa: E402
+
+# 🏷️ Supplier upsert against an in-memory SQLite copy of the Fournisseur table (same filtered unique
+# indexes); the handful of T-SQL constructs db.fournisseur uses are rewritten on the fly
+
+
+class SqliteCursor:
+    def __init__(self, db):
+        self._cursor = db.cursor()
+
+    def execute(self, sql, params=()):
+        if "TOP 1 " in sql:
+            sql = sql.replace("TOP 1 ", "") + " LIMIT 1"
+        if "OUTPUT INSERTED.id" in sql:
+            sql = sql.replace("OUTPUT INSERTED.id", "") + " RETURNING id"
+        try:
+            self._cursor.execute(sql, params)
+        except sqlite3.IntegrityError as e:
+            raise pyodbc.IntegrityError(str(e))
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+
+class SqliteConnection:
+    def __init__(self):
+        self.db = sqlite3.connect(":memory:")
+        self.db.executescript("""
+        CREATE TABLE Fournisseur (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, nom TEXT, ice TEXT, [if] TEXT, adresse TEXT,
+            tel TEXT, email TEXT, siteweb TEXT, cnss TEXT, nom_norm TEXT
+        );
+        CREATE UNIQUE INDEX UX_Fournisseur_ice ON Fournisseur (ice) WHERE ice IS NOT NULL;
+        CREATE UNIQUE INDEX UX_Fournisseur_if ON Fournisseur ([if]) WHERE [if] IS NOT NULL;
+        """)
+
+    def cursor(self):
+        return SqliteCursor(self.db)
+
+    def row(self, fournisseur_id):
+        return self.db.execute("SELECT nom, ice, [if] FROM Fournisseur WHERE id = ?", (fournisseur_id,)).fetchone()
+
+
+@pytest.fixture
+def conn():
+    fournisseur.invalidate_fournisseur_cache()
+    yield SqliteConnection()
+    fournisseur.invalidate_fournisseur_cache()
+
+
+def test_same_ice_reuses_supplier(conn):
+    first = fournisseur.get_or_create_fournisseur({"nom": "Atlas SARL", "ice": "001234567000089", "if": "123"}, conn)
+    again = fournisseur.get_or_create_fournisseur({"nom": "ATLAS", "ice": "001 234 567 000 089"}, conn)
+    assert again == first
+
+
+def test_conflicting_ice_creates_supplier_without_the_held_if(conn):
+    atlas = fournisseur.get_or_create_fournisseur({"nom": "Atlas SARL", "ice": "001234567000089", "if": "123"}, conn)
+    # same IF, another ICE: a different supplier, and UX_Fournisseur_if must not fail its insert
+    other = fournisseur.get_or_create_fournisseur({"nom": "Atlas SA", "ice": "009876543000012", "if": "123"}, conn)
+    assert other is not None and other != atlas
+    assert conn.row(other) == ("Atlas SA", "009876543000012", None)
+    assert conn.row(atlas) == ("Atlas SARL", "001234567000089", "123")
+
+
+def test_if_taken_between_lookup_and_insert(conn, monkeypatch):
+    fournisseur.get_or_create_fournisseur({"nom": "Atlas SARL", "ice": "001234567000089", "if": "123"}, conn)
+    # the lookup saw no IF holder (e.g. a concurrent insert had not committed yet)
+    holder = fournisseur._if_holder
+    calls = []
+
+    def late_holder(if_, c=None):
+        calls.append(if_)
+        return None if len(calls) == 1 else holder(if_, c)
+
+    monkeypatch.setattr(fournisseur, "_if_holder", late_holder)
+    other = fournisseur.get_or_create_fournisseur({"nom": "Sigma", "ice": "009876543000012", "if": "123"}, conn)
+    assert conn.row(other) == ("Sigma", "009876543000012", None)
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from extractor.ai_extractor import extract_first_json
+from extractor.json_stream import JsonObjectScanner
+
+# 🧵 The scanner sees the reply as the stream delivers it: any split point must give the same object
+REPLY = {
+    "invoice_number": "F-2024/118",
+    "fournisseur_name": "Atlas {Maroc}",
+    "fournisseur_address": "12, \"Bd} Zerktouni\" \\ Casablanca",
+    "products": [{"designation": "Câble {3x2.5}", "quantity": "2", "unit_price": "1 000,00"}],
+    "notes": "}{ \\\" {",
+}
+REPLY_JSON = json.dumps(REPLY, ensure_ascii=False)
+PROSE = "Voici les données extraites :\n" + REPLY_JSON + "\nN'hésitez pas si besoin. {\"ignored\": true}"
+
+
+def scan(chunks):
+    scanner = JsonObjectScanner()
+    for chunk in chunks:
+        if scanner.feed(chunk):
+            break
+    return scanner
+
+
+def test_whole_reply():
+    assert json.loads(extract_first_json(PROSE)) == REPLY
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64])
+def test_split_chunks(size):
+    scanner = scan(PROSE[i:i + size] for i in range(0, len(PROSE), size))
+    assert scanner.done
+    assert json.loads(scanner.result) == REPLY
+
+
+def test_every_split_point():
+    for cut in range(1, len(PROSE)):
+        scanner = scan([PROSE[:cut], PROSE[cut:]])
+        assert scanner.result == REPLY_JSON, cut
+
+
+def test_braces_inside_strings():
+    text = '{"a": "}", "b": "{{", "c": {"d": "}}"}} trailing }'
+    assert extract_first_json(text) == '{"a": "}", "b": "{{", "c": {"d": "}}"}}'
+
+
+def test_escaped_quotes():
+    # \" stays inside the string, \\ closes the escape so the next quote ends it
+    text = r'{"a": "say \"}\" now", "b": "back\\", "c": "}"} after'
+    assert json.loads(extract_first_json(text)) == {"a": 'say "}" now', "b": "back\\", "c": "}"}
+
+
+def test_escape_split_across_chunks():
+    scanner = scan(['{"a": "x\\', '"}', '"}'])
+    assert scanner.result == '{"a": "x\\"}"}'
+
+
+def test_truncated_trailing_object():
+    # max_tokens reached mid-object: nothing is returned, the raw text is kept for the error reply
+    truncated = PROSE[:PROSE.index(REPLY_JSON) + len(REPLY_JSON) - 5]
+    scanner = scan(truncated[i:i + 10] for i in range(0, len(truncated), 10))
+    assert not scanner.done
+    assert scanner.result is None
+    assert scanner.text == truncated
+
+
+def test_no_object():
+    assert extract_first_json("Désolé, je ne peux pas lire ce document.") is None
+
+
+def test_feed_after_result_is_ignored():
+    scanner = JsonObjectScanner()
+    assert scanner.feed('{"a": 1} {"b"') == '{"a": 1}'
+    assert scanner.feed(': 2}') == '{"a": 1}'
+    assert scanner.feed(None) == '{"a": 1}'
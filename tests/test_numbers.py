@@ -0,0 +1,92 @@
+import math
+
+import pytest
+
+from extractor.numbers import NUMBER_VECTOR_MIN, amount_issues, parse_number
+
+# 🔢 One expectation per spelling, checked on the plain Python path and on the pandas path
+CASES = [
+    ("1 234,56", 1234.56),
+    ("1 234,56 DH", 1234.56),
+    ("1.234,56", 1234.56),
+    ("1,234.56 MAD", 1234.56),
+    ("1.234.567", 1234567.0),
+    ("1,234,567", 1234567.0),
+    ("12 500", 12500.0),
+    ("0,5", 0.5),
+    ("3.75", 3.75),
+    ("-3,5 €", -3.5),
+    ("-1 234,56", -1234.56),
+    (42, 42.0),
+    (-7.25, -7.25),
+    ("", None),
+    ("N/A", None),
+    ("abc", None),
+    ("--", None),
+    (None, None),
+    (True, None),
+    (float("nan"), None),
+]
+
+
+@pytest.mark.parametrize("value, expected", CASES)
+def test_parse_number(value, expected):
+    assert parse_number(value) == expected
+
+
+def _as_floats(expected):
+    return [math.nan if e is None else e for e in expected]
+
+
+@pytest.mark.parametrize("repeat", [1, NUMBER_VECTOR_MIN])
+def test_parse_numbers_matches_parse_number(repeat):
+    np = pytest.importorskip("numpy")
+    if repeat > 1:
+        pytest.importorskip("pandas")
+    from extractor.numbers import parse_numbers
+
+    # repeat = 1 stays under NUMBER_VECTOR_MIN (Python path), NUMBER_VECTOR_MIN copies take the pandas one
+    values = [v for v, _ in CASES] * repeat
+    expected = _as_floats([e for _, e in CASES] * repeat)
+    np.testing.assert_array_equal(parse_numbers(values), np.array(expected, dtype=float))
+
+
+def test_consistent_amounts_have_no_issue():
+    pytest.importorskip("numpy")
+    products = [
+        {"quantity": "2", "unit_price": "1 000,00", "total_price": "2 000,00"},
+        {"quantity": 3, "unit_price": "12,50", "total_price": "37,50"},
+    ]
+    assert amount_issues(products, "2 037,50", "407,50", "2 445,00") == []
+
+
+def test_ht_plus_tva_not_ttc():
+    pytest.importorskip("numpy")
+    issues = amount_issues([], "1 000,00", "200,00", "1 250,00")
+    assert issues == [{"check": "ht_plus_tva_vs_ttc", "total_ht": 1000.0, "vat_amount": 200.0, "total_ttc": 1250.0}]
+
+
+def test_rounding_within_tolerance():
+    pytest.importorskip("numpy")
+    # a few centimes of rounding are not a mismatch
+    assert amount_issues([], "1 000,01", "200,00", "1 200,00") == []
+
+
+def test_line_and_total_ht_mismatches():
+    pytest.importorskip("numpy")
+    products = [
+        {"quantity": "2", "unit_price": "10,00", "total_price": "20,00"},
+        {"quantity": "1", "unit_price": "5,00", "total_price": "50,00"},
+        {"quantity": None, "unit_price": "5,00", "total_price": "5,00"},
+    ]
+    issues = amount_issues(products, "80,00")
+    assert issues == [
+        {"check": "line_total", "lines": [1]},
+        {"check": "lines_vs_total_ht", "lines_sum": 75.0, "total_ht": 80.0},
+    ]
+
+
+def test_garbage_amounts_are_skipped():
+    pytest.importorskip("numpy")
+    products = [{"quantity": "deux", "unit_price": "?", "total_price": "N/A"}, "not a product"]
+    assert amount_issues(products, "n/a", None, "1 200,00") == []
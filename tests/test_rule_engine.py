@@ -0,0 +1,41 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from bench.synthetic import invoice_lines
+from extractor.extractor_router import extract_entities_timed
+
+# 📐 Golden texts: tests/golden/<name>.json holds what the hand-written extractor the rule engine replaced
+# (extract_* functions of extractor_router before the rules) returned for <name>.txt, bugs included.
+# Label / value columns and OCR blank lines put values several lines below their label.
+GOLDEN = Path(__file__).parent / "golden"
+
+
+@pytest.mark.parametrize("name", sorted(p.stem for p in GOLDEN.glob("*.txt")))
+def test_matches_previous_extractor(name):
+    text = (GOLDEN / f"{name}.txt").read_text(encoding="utf-8")
+    expected = json.loads((GOLDEN / f"{name}.json").read_text(encoding="utf-8"))
+    data, _ = extract_entities_timed(text)
+    assert data == expected
+
+
+def test_synthetic_invoice():
+    lines, products = invoice_lines(20, seed=7)
+    data, timings = extract_entities_timed("\n".join(lines))
+    assert data["fournisseur_ice"] == "001526789000045"
+    assert data["invoice_date"] == "2024-03-12"
+    assert data["total_ttc"] is not None
+    assert [p["designation"] for p in data["products"]] == [p["designation"] for p in products]
+    assert "total_ttc" in timings
+
+
+# deliberate departures from the previous extractor
+def test_invoice_number_keeps_its_separators():
+    data, _ = extract_entities_timed("Facture N° 2024/118\nDate 12-03-24")
+    assert data["invoice_number"] == "2024/118"
+
+
+def test_invoice_number_is_not_a_date():
+    data, _ = extract_entities_timed("Facture du 2024-03-12\nFacture N° 58213")
+    assert data["invoice_number"] == "58213"